@@ -0,0 +1,102 @@
+import numpy as np
+
+import solver_stats
+from clingo_facets import ground_facet_program
+
+WORD_BITS = 64
+CHUNK_ROWS = 65536
+
+
+def build_answer_matrix(projected_file):
+    """Enumerate all answer sets once into a packed bit matrix.
+
+    Every shown atom gets a column; row r has bit c set when atom c is in
+    answer set r. Returns (atoms, columns, rows) with rows a uint64 array of
+    shape (#answer sets, ceil(#atoms / 64)).
+    """
+    ctl = ground_facet_program(projected_file, "Answer matrix")
+    atoms = []
+    columns = {}
+    model_columns = []
+    with ctl.solve(yield_=True) as handle:
+        for model in handle:
+            cols = []
+            for symbol in model.symbols(shown=True):
+                col = columns.get(symbol)
+                if col is None:
+                    col = columns[symbol] = len(atoms)
+                    atoms.append(symbol)
+                cols.append(col)
+            model_columns.append(cols)
+    solver_stats.record("Answer matrix", ctl)
+
+    atoms = [str(atom) for atom in atoms]
+    columns = {atom: col for col, atom in enumerate(atoms)}
+    n_words = max(1, -(-len(atoms) // WORD_BITS))
+    rows = np.empty((len(model_columns), n_words), dtype=np.uint64)
+    # Pack in chunks to keep the unpacked bool matrix small
+    for start in range(0, len(model_columns), CHUNK_ROWS):
+        chunk = model_columns[start:start + CHUNK_ROWS]
+        dense = np.zeros((len(chunk), n_words * WORD_BITS), dtype=bool)
+        for row, cols in enumerate(chunk):
+            dense[row, cols] = True
+        rows[start:start + len(chunk)] = np.packbits(dense, axis=1, bitorder='little').view(np.uint64)
+    return atoms, columns, rows
+
+
+def column_mask(columns, atoms, n_words):
+    """uint64 word mask with the bits of the given atoms set, None if an atom has no column."""
+    mask = np.zeros(n_words, dtype=np.uint64)
+    for atom in atoms:
+        col = columns.get(atom)
+        if col is None:
+            return None
+        mask[col // WORD_BITS] |= np.uint64(1) << np.uint64(col % WORD_BITS)
+    return mask
+
+
+def route_rows(matrix, in_atoms, ex_atoms):
+    """Boolean selector of answer sets containing all in_atoms and none of ex_atoms."""
+    atoms, columns, rows = matrix
+    n_words = rows.shape[1]
+    need = column_mask(columns, in_atoms, n_words)
+    if need is None:
+        # an atom that is never true cannot be included
+        return np.zeros(rows.shape[0], dtype=bool)
+    # atoms that are never true are trivially excluded
+    forbid = column_mask(columns, [atom for atom in ex_atoms if atom in columns], n_words)
+    return np.all((rows & need) == need, axis=1) & np.all((rows & forbid) == 0, axis=1)
+
+
+def mask_atoms(atoms, words):
+    bits = np.unpackbits(words.view(np.uint8), bitorder='little')[:len(atoms)]
+    return [atoms[col] for col in np.flatnonzero(bits)]
+
+
+def matrix_facets(matrix, in_atoms, ex_atoms):
+    """Sorted facets under a route: atoms in some but not all selected answer sets."""
+    atoms, columns, rows = matrix
+    selected = rows[route_rows(matrix, in_atoms, ex_atoms)]
+    if selected.shape[0] == 0:
+        return []
+    union = np.bitwise_or.reduce(selected, axis=0)
+    intersection = np.bitwise_and.reduce(selected, axis=0)
+    return sorted(mask_atoms(atoms, union & ~intersection))
+
+
+def matrix_answer_count(matrix, in_atoms, ex_atoms):
+    """Number of answer sets under a route, fasb '#!'."""
+    return int(np.count_nonzero(route_rows(matrix, in_atoms, ex_atoms)))
+
+
+def matrix_facet_counts(matrix, in_atoms, ex_atoms):
+    """Facet count left after activating each facet, fasb '#??'.
+
+    Like fasb's '#?', counts include both polarities, i.e. twice the number
+    of facet atoms. Keys are 'a' for activating a and '~a' for excluding it.
+    """
+    counts = {}
+    for facet in matrix_facets(matrix, in_atoms, ex_atoms):
+        counts[facet] = 2 * len(matrix_facets(matrix, list(in_atoms) + [facet], ex_atoms))
+        counts[f"~{facet}"] = 2 * len(matrix_facets(matrix, in_atoms, list(ex_atoms) + [facet]))
+    return counts
@@ -0,0 +1,211 @@
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+
+
+class AtomTable:
+    """Intern table mapping atom strings to small integer IDs and back."""
+    __slots__ = ("atoms", "ids")
+
+    def __init__(self):
+        self.atoms = []
+        self.ids = {}
+
+    def intern(self, atom):
+        atom_id = self.ids.get(atom)
+        if atom_id is None:
+            atom_id = self.ids[atom] = len(self.atoms)
+            self.atoms.append(atom)
+        return atom_id
+
+    def encode(self, atoms):
+        return array('I', [self.intern(str(atom)) for atom in atoms])
+
+    def decode(self, atom_ids):
+        return [self.atoms[atom_id] for atom_id in atom_ids]
+
+
+class AnswerSetRecord:
+    __slots__ = ("atom_ids", "in_ids", "ex_ids", "facet_ids")
+
+    def __init__(self, atom_ids, in_ids, ex_ids):
+        self.atom_ids = atom_ids
+        self.in_ids = in_ids
+        self.ex_ids = ex_ids
+        self.facet_ids = ()
+
+
+class AnswerSetStore:
+    """Compact store of projected answer sets for navigation mode.
+
+    Replaces the parallel lists of symbols, included atoms, excluded atoms
+    and facets: atoms are interned once, records hold integer-ID arrays and
+    equal facet lists share one tuple. Records are indexed in O(1).
+    """
+    __slots__ = ("table", "records", "facet_lists")
+
+    def __init__(self):
+        self.table = AtomTable()
+        self.records = []
+        # hash-consed facet ID tuples
+        self.facet_lists = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, answer_set, filtered_in_atoms, filtered_ex_atoms):
+        """Add a projected answer set and return its index."""
+        self.records.append(AnswerSetRecord(self.table.encode(answer_set),
+                                            self.table.encode(filtered_in_atoms),
+                                            self.table.encode(filtered_ex_atoms)))
+        return len(self.records) - 1
+
+    def set_facets(self, index, facet_list):
+        facet_ids = tuple(self.table.encode(facet_list))
+        self.records[index].facet_ids = self.facet_lists.setdefault(facet_ids, facet_ids)
+
+    def answer_set(self, index):
+        return self.table.decode(self.records[index].atom_ids)
+
+    def format_answer_set(self, index):
+        """Render like a printed list of clingo symbols."""
+        return "[" + ", ".join(self.answer_set(index)) + "]"
+
+    def in_atoms(self, index):
+        return self.table.decode(self.records[index].in_ids)
+
+    def ex_atoms(self, index):
+        return self.table.decode(self.records[index].ex_ids)
+
+    def facets(self, index):
+        return self.table.decode(self.records[index].facet_ids)
+
+    def close(self):
+        pass
+
+
+class AppendOnlyArray:
+    """Typed array appended to a file and read back through mmap."""
+    __slots__ = ("typecode", "writer", "length", "map", "view")
+
+    def __init__(self, path, typecode):
+        self.typecode = typecode
+        self.writer = open(path, 'w+b')
+        self.length = 0
+        self.map = None
+        self.view = None
+
+    def extend(self, values):
+        self.writer.write(array(self.typecode, values).tobytes())
+        self.length += len(values)
+
+    def get(self, start, stop):
+        if start == stop:
+            return []
+        if self.view is None or stop > len(self.view):
+            self.remap()
+        return self.view[start:stop].tolist()
+
+    def remap(self):
+        self.writer.flush()
+        self.release()
+        self.map = mmap.mmap(self.writer.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map).cast(self.typecode)
+
+    def release(self):
+        if self.view is not None:
+            self.view.release()
+            self.map.close()
+        self.view = None
+        self.map = None
+
+    def close(self):
+        self.release()
+        self.writer.close()
+
+
+class DiskAnswerSetStore:
+    """AnswerSetStore spilled to memory-mapped files, for huge enumerations.
+
+    The projected assignment of each answer set is a fixed-width bit row
+    over show_atoms; answer-set atoms and facets are uint32 atom-ID runs
+    addressed by uint64 end offsets. Only the atom intern table stays in
+    memory, so RSS does not grow with #AS. Facets must be set in index order.
+    """
+    __slots__ = ("directory", "show_atoms", "positions", "row_bytes", "table",
+                 "rows", "atom_ids", "atom_ends", "facet_ids", "facet_ends")
+
+    def __init__(self, spill_dir, show_atoms):
+        os.makedirs(spill_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="answer_store_", dir=spill_dir)
+        self.show_atoms = list(show_atoms)
+        self.positions = {}
+        for atom in self.show_atoms:
+            self.positions.setdefault(atom, len(self.positions))
+        self.row_bytes = max(1, -(-len(self.positions) // 8))
+        self.table = AtomTable()
+        self.rows = AppendOnlyArray(os.path.join(self.directory, "rows.bin"), 'B')
+        self.atom_ids = AppendOnlyArray(os.path.join(self.directory, "atoms.bin"), 'I')
+        self.atom_ends = AppendOnlyArray(os.path.join(self.directory, "atoms.idx"), 'Q')
+        self.facet_ids = AppendOnlyArray(os.path.join(self.directory, "facets.bin"), 'I')
+        self.facet_ends = AppendOnlyArray(os.path.join(self.directory, "facets.idx"), 'Q')
+
+    def __len__(self):
+        return self.atom_ends.length
+
+    def append(self, answer_set, filtered_in_atoms, filtered_ex_atoms):
+        """Add a projected answer set and return its index.
+
+        filtered_ex_atoms is implied by the bit row, it is the complement
+        of filtered_in_atoms in show_atoms.
+        """
+        row = bytearray(self.row_bytes)
+        for atom in filtered_in_atoms:
+            position = self.positions[atom]
+            row[position // 8] |= 1 << (position % 8)
+        self.rows.extend(row)
+        self.atom_ids.extend(self.table.encode(answer_set))
+        self.atom_ends.extend([self.atom_ids.length])
+        return len(self) - 1
+
+    def set_facets(self, index, facet_list):
+        if index != self.facet_ends.length:
+            raise ValueError(f"Facets must be set in order, expected index {self.facet_ends.length}")
+        self.facet_ids.extend(self.table.encode(facet_list))
+        self.facet_ends.extend([self.facet_ids.length])
+
+    def run(self, ids, ends, index):
+        start = ends.get(index - 1, index)[0] if index > 0 else 0
+        stop = ends.get(index, index + 1)[0]
+        return ids.get(start, stop)
+
+    def answer_set(self, index):
+        return self.table.decode(self.run(self.atom_ids, self.atom_ends, index))
+
+    def format_answer_set(self, index):
+        """Render like a printed list of clingo symbols."""
+        return "[" + ", ".join(self.answer_set(index)) + "]"
+
+    def projected(self, index, included):
+        row = self.rows.get(index * self.row_bytes, (index + 1) * self.row_bytes)
+        return [atom for atom in self.show_atoms
+                if bool(row[self.positions[atom] // 8] >> (self.positions[atom] % 8) & 1) == included]
+
+    def in_atoms(self, index):
+        return self.projected(index, True)
+
+    def ex_atoms(self, index):
+        return self.projected(index, False)
+
+    def facets(self, index):
+        if index >= self.facet_ends.length:
+            return []
+        return self.table.decode(self.run(self.facet_ids, self.facet_ends, index))
+
+    def close(self):
+        """Close the spill files and delete them."""
+        for spill in (self.rows, self.atom_ids, self.atom_ends, self.facet_ids, self.facet_ends):
+            spill.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
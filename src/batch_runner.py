@@ -0,0 +1,211 @@
+import os
+import json
+import glob
+import time
+import signal
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from multiprocessing.connection import wait
+from contextlib import redirect_stdout
+from collections import deque
+from datetime import datetime
+
+# Imported once here, every instance runs in a fork of this process
+import interp_proj_fasb
+import facet_cache
+import child_usage
+import solver_stats
+import metrics_export
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTANCE_DIR = os.path.join(SRC_DIR, "..", "input_instance")
+LOG_DIR = os.path.join(SRC_DIR, "..", "log")
+
+
+def run_instance(projected_file, options, log_path, memory_mb, conn):
+    """Child side: run main() on one instance, its stdout goes to log_path."""
+    # Own process group, a timeout then also kills the fasb children
+    os.setsid()
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    scratch_dir = tempfile.mkdtemp(prefix="batch_")
+    result = {"instance": projected_file, "status": "ok"}
+    try:
+        with open(log_path, 'w') as log, redirect_stdout(log):
+            print(f"Processing file: {projected_file}")
+            interp_proj_fasb.init_facet_worker(scratch_dir, options["cache_dir"], options["cache_size"])
+            interp_proj_fasb.start_profile("Entire program")
+            if options.get("metrics_dir"):
+                name = os.path.basename(projected_file).replace(".lp", ".prom")
+                metrics_export.start(os.path.join(options["metrics_dir"], f"epasufr_{name}"),
+                                     interp_proj_fasb.profile_data, options["metrics_interval"], projected_file)
+            result["answer_sets"] = interp_proj_fasb.main(projected_file, engine=options["engine"],
+                                                          jobs=options["jobs"], quiet=options["quiet"],
+                                                          navigation=False)
+            facet_cache.close()
+            interp_proj_fasb.record_profile("Entire program")
+            metrics_export.stop()
+            interp_proj_fasb.print_profile()
+    except MemoryError:
+        result["status"] = "memory"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = repr(e)
+    finally:
+        metrics_export.stop()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    result["profile"] = dict(interp_proj_fasb.profile_data)
+    result["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result["children"] = {"user": children.ru_utime, "system": children.ru_stime,
+                          "max_rss_kb": children.ru_maxrss, "stages": child_usage.snapshot()}
+    result["solver"] = solver_stats.snapshot()
+    conn.send(result)
+    conn.close()
+
+
+def finish(process, conn, projected_file, status=None, memory_limited=False):
+    """Parent side: result of an ended or killed instance."""
+    result = None
+    if status is None and conn.poll():
+        try:
+            result = conn.recv()
+        except EOFError:
+            pass
+    process.join()
+    conn.close()
+    if result is None:
+        if status is None:
+            # The OOM killer sends SIGKILL and clingo aborts on bad_alloc under the address space
+            # limit, neither reports back. Other deaths, segfaults included, are crashes.
+            out_of_memory = (process.exitcode == -signal.SIGKILL or
+                             (memory_limited and process.exitcode == -signal.SIGABRT))
+            status = "memory" if out_of_memory else "crashed"
+        result = {"instance": projected_file, "status": status, "exitcode": process.exitcode}
+    return result
+
+
+def run_batch(instances, options, workers=1, timeout=None, memory_mb=None, log_dir=LOG_DIR):
+    """Run instances in up to workers forked children, yield one result dict per instance.
+
+    An instance exceeding timeout seconds is killed with its whole process
+    group and reported with status "timeout".
+    """
+    context = multiprocessing.get_context("fork")
+    pending = deque(instances)
+    # sentinel -> (process, conn, instance, start time)
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            projected_file = pending.popleft()
+            log_path = os.path.join(log_dir, os.path.basename(projected_file).replace(".lp", ".log"))
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_instance,
+                                      args=(projected_file, options, log_path, memory_mb, sender))
+            process.start()
+            sender.close()
+            running[process.sentinel] = (process, receiver, projected_file, time.time())
+        wait_time = None
+        if timeout is not None:
+            now = time.time()
+            wait_time = max(0.0, min(start + timeout - now for _, _, _, start in running.values()))
+        # a child can block sending its result, so wake up on the pipe as well
+        ready = wait(list(running) + [entry[1] for entry in running.values()], wait_time)
+        now = time.time()
+        for sentinel, (process, conn, projected_file, start) in list(running.items()):
+            if sentinel in ready or conn in ready:
+                result = finish(process, conn, projected_file, memory_limited=bool(memory_mb))
+            elif timeout is not None and now - start >= timeout:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                result = finish(process, conn, projected_file, "timeout")
+            else:
+                continue
+            del running[sentinel]
+            result["seconds"] = round(now - start, 4)
+            yield result
+
+
+def collect_instances(paths):
+    instances = []
+    for path in paths or [INSTANCE_DIR]:
+        if os.path.isdir(path):
+            instances.extend(sorted(glob.glob(os.path.join(path, "*.lp"))))
+        else:
+            instances.append(path)
+    return instances
+
+
+def previous_timeouts(results_file):
+    with open(results_file, 'r') as f:
+        return {record["instance"] for record in map(json.loads, f) if record["status"] == "timeout"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python batch_runner.py [instances or dirs ...] [--workers N] [--timeout S] [--memory-mb MB]")
+    parser.add_argument("instances", nargs="*",
+                        help=".lp files or directories of them, default ../input_instance")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="instances run concurrently")
+    parser.add_argument("--timeout", type=float,
+                        help="wall-clock seconds per instance before it is killed")
+    parser.add_argument("--memory-mb", type=int,
+                        help="address space limit per instance, fasb calls included")
+    parser.add_argument("--engine", choices=["fasb", "fasb-session", "clingo", "single-pass", "matrix"],
+                        default="fasb")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="facet worker processes inside each instance")
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--cache-size", type=int, default=100000)
+    parser.add_argument("--quiet", action="store_true",
+                        help="keep the per answer set report out of the instance logs")
+    parser.add_argument("--skip-timeouts", metavar="RESULTS",
+                        help="skip instances that timed out in an earlier results.jsonl")
+    parser.add_argument("--log-dir",
+                        help="directory for instance logs and results.jsonl, default ../log/batch_<date>")
+    parser.add_argument("--metrics-dir",
+                        help="write OpenMetrics .prom files per instance and for the batch to this directory, "
+                             "e.g. the node_exporter textfile collector directory")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between metrics updates of a running instance (default 15)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be a positive integer")
+    if args.metrics_interval <= 0:
+        parser.error("--metrics-interval must be positive")
+    if args.metrics_dir:
+        os.makedirs(args.metrics_dir, exist_ok=True)
+
+    instances = collect_instances(args.instances)
+    if args.skip_timeouts:
+        skipped = previous_timeouts(args.skip_timeouts)
+        instances = [instance for instance in instances if instance not in skipped]
+    log_dir = args.log_dir or os.path.join(LOG_DIR, datetime.now().strftime("batch_%d-%m-%Y_%H-%M-%S"))
+    os.makedirs(log_dir, exist_ok=True)
+    options = {"engine": args.engine, "jobs": args.jobs, "quiet": args.quiet,
+               "cache_dir": args.cache_dir, "cache_size": args.cache_size,
+               "metrics_dir": args.metrics_dir, "metrics_interval": args.metrics_interval}
+
+    timeouts = []
+    statuses = {}
+    with open(os.path.join(log_dir, "results.jsonl"), 'w') as results:
+        for result in run_batch(instances, options, args.workers, args.timeout, args.memory_mb, log_dir):
+            results.write(json.dumps(result) + "\n")
+            results.flush()
+            print(f"{result['status']:<8} {result['seconds']:>10.2f}s  {result.get('answer_sets', '-'):>8}  "
+                  f"{os.path.basename(result['instance'])}", flush=True)
+            if result["status"] == "timeout":
+                timeouts.append(result["instance"])
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+            if args.metrics_dir:
+                metrics_export.write_batch(os.path.join(args.metrics_dir, "epasufr_batch.prom"),
+                                           statuses, len(instances) - sum(statuses.values()))
+    print(f"\n{len(instances)} instances, {len(timeouts)} timeouts, logs in {log_dir}")
+    for instance in timeouts:
+        print(f"  timeout: {instance}")
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+from batch_runner import LOG_DIR
+from bench_suite import run_suite, write_json
+
+
+def compare(baseline, current, tolerance, min_seconds=0.0, stages=None):
+    """Return (regressions, rows) of stage medians in current vs baseline.
+
+    A stage regresses when its median grew by more than tolerance (0.1 is
+    10%) and by more than min_seconds, so noise on tiny stages is ignored.
+    Stages missing on either side, e.g. after switching the facet engine,
+    are reported but never regress.
+    """
+    regressions = []
+    rows = []
+    for instance, base_summary in baseline.items():
+        summary = current.get(instance)
+        if summary is None:
+            continue
+        names = stages or sorted(set(base_summary["stages"]) | set(summary["stages"]))
+        for stage in names:
+            base = base_summary["stages"].get(stage)
+            new = summary["stages"].get(stage)
+            if base is None or new is None:
+                rows.append((instance, stage, base and base["median"], new and new["median"], None, "missing"))
+                continue
+            change = (new["median"] - base["median"]) / base["median"] if base["median"] > 0 else 0.0
+            regressed = change > tolerance and new["median"] - base["median"] > min_seconds
+            rows.append((instance, stage, base["median"], new["median"], change, "REGRESSION" if regressed else "ok"))
+            if regressed:
+                regressions.append((instance, stage))
+        if "ok" not in summary["statuses"]:
+            rows.append((instance, "run", None, None, None, "/".join(sorted(set(summary["statuses"])))))
+            regressions.append((instance, "run"))
+    return regressions, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python bench_compare.py baseline.json [instances ...] [--tolerance 0.1]")
+    parser.add_argument("baseline", help="results .json written by bench_suite.py")
+    parser.add_argument("instances", nargs="*", help="subset of the baseline instances to re-run")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative slowdown of a stage median, 0.1 is 10%%")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="slowdowns smaller than this many seconds are noise")
+    parser.add_argument("--stage", action="append", dest="stages",
+                        help="only gate this profile key (repeatable), default every stage")
+    parser.add_argument("--engine", choices=["fasb", "fasb-session", "clingo", "single-pass", "matrix"],
+                        help="facet engine of the new run, default the baseline's")
+    parser.add_argument("--warmup", type=int, help="default the baseline's")
+    parser.add_argument("--repeat", type=int, help="default the baseline's")
+    parser.add_argument("--timeout", type=float, help="default the baseline's")
+    parser.add_argument("--output", help="also save the new run as results .json")
+    args = parser.parse_args()
+
+    with open(args.baseline, 'r') as f:
+        baseline_file = json.load(f)
+    settings = dict(baseline_file["settings"])
+    for key in ("engine", "warmup", "repeat", "timeout"):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    baseline = baseline_file["instances"]
+    if args.instances:
+        wanted = {os.path.basename(instance) for instance in args.instances}
+        baseline = {instance: summary for instance, summary in baseline.items()
+                    if os.path.basename(instance) in wanted}
+        if not baseline:
+            parser.error("none of the given instances are in the baseline")
+
+    log_dir = os.path.join(LOG_DIR, datetime.now().strftime("compare_%d-%m-%Y_%H-%M-%S"))
+    os.makedirs(log_dir, exist_ok=True)
+    options = {"engine": settings["engine"], "jobs": settings["jobs"], "quiet": True,
+               "cache_dir": None, "cache_size": None}
+    current = run_suite(list(baseline), options, settings["warmup"], settings["repeat"],
+                        settings.get("workers", 1), settings.get("timeout"), settings.get("memory_mb"), log_dir)
+    if args.output:
+        write_json(args.output, current, settings)
+
+    regressions, rows = compare(baseline, current, args.tolerance, args.min_seconds, args.stages)
+    for instance, stage, base, new, change, verdict in rows:
+        base_text = f"{base:.4f}s" if base is not None else "-"
+        new_text = f"{new:.4f}s" if new is not None else "-"
+        change_text = f"{change * 100:+.1f}%" if change is not None else ""
+        print(f"{verdict:<11} {os.path.basename(instance):<46} {stage:<32} {base_text:>10} -> {new_text:>10} {change_text}")
+    print(f"\n{len(regressions)} regressions (tolerance {args.tolerance * 100:.0f}%, min {args.min_seconds}s)")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,155 @@
+import os
+import csv
+import json
+import argparse
+import statistics
+from datetime import datetime
+
+from batch_runner import run_batch, collect_instances, LOG_DIR
+from interp_proj_fasb import extract_show_atoms
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PLOT_CSV = os.path.join(SRC_DIR, "..", "plot", "dataforplot.csv")
+
+
+def stage_stats(values):
+    """Median and spread of one stage's times over the measured repetitions."""
+    values = sorted(values)
+    stats = {"n": len(values),
+             "median": statistics.median(values),
+             "min": values[0],
+             "max": values[-1],
+             "stdev": statistics.stdev(values) if len(values) > 1 else 0.0}
+    if len(values) > 1:
+        q1, q2, q3 = statistics.quantiles(values, n=4, method="inclusive")
+        stats["iqr"] = q3 - q1
+    else:
+        stats["iqr"] = 0.0
+    return stats
+
+
+def summarize(runs):
+    """Per-stage statistics of the successful runs of one instance."""
+    ok_runs = [run for run in runs if run["status"] == "ok"]
+    stages = {}
+    for run in ok_runs:
+        for stage, seconds in run["profile"].items():
+            stages.setdefault(stage, []).append(seconds)
+    solver = {}
+    for run in ok_runs:
+        for stage, counters in run.get("solver", {}).items():
+            for name, value in counters.items():
+                solver.setdefault(stage, {}).setdefault(name, []).append(value)
+    return {"answer_sets": ok_runs[0]["answer_sets"] if ok_runs else None,
+            "statuses": [run["status"] for run in runs],
+            "stages": {stage: stage_stats(values) for stage, values in stages.items()},
+            # clingo statistics, median per counter
+            "solver": {stage: {name: statistics.median(values) for name, values in counters.items()}
+                       for stage, counters in solver.items()}}
+
+
+def run_suite(instances, options, warmup=1, repeat=5, workers=1, timeout=None, memory_mb=None, log_dir=LOG_DIR):
+    """Run every instance warmup + repeat times, return {instance: summary}.
+
+    Rounds go over all instances in turn so drift of the machine spreads
+    over every instance. Warmup rounds only fill OS and fasb caches. An
+    instance that times out is not run again.
+    """
+    runs = {instance: [] for instance in instances}
+    remaining = list(instances)
+    for round_idx in range(warmup + repeat):
+        measured = round_idx >= warmup
+        print(f"{'Round' if measured else 'Warmup'} {round_idx - warmup + 1 if measured else round_idx + 1}: "
+              f"{len(remaining)} instances", flush=True)
+        for result in run_batch(remaining, options, workers, timeout, memory_mb, log_dir):
+            if measured or result["status"] != "ok":
+                runs[result["instance"]].append(result)
+            if result["status"] == "timeout":
+                remaining.remove(result["instance"])
+    return {instance: summarize(instance_runs) for instance, instance_runs in runs.items()}
+
+
+def write_json(path, suite, settings):
+    with open(path, 'w') as f:
+        json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                   "settings": settings,
+                   "instances": suite}, f, indent=1)
+
+
+def write_csv(path, suite):
+    """One row per (instance, stage)."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["instance", "answer_sets", "stage", "n", "median", "min", "max", "stdev", "iqr"])
+        for instance, summary in suite.items():
+            for stage, stats in sorted(summary["stages"].items()):
+                writer.writerow([os.path.basename(instance), summary["answer_sets"], stage,
+                                 stats["n"]] + [f"{stats[key]:.4f}" for key in ("median", "min", "max", "stdev", "iqr")])
+
+
+def write_plot_csv(path, suite):
+    """Medians in the layout of plot/dataforplot.csv, sorted by #AS."""
+    rows = []
+    for instance, summary in suite.items():
+        stages = summary["stages"]
+        if summary["answer_sets"] is None:
+            continue
+        with open(instance, 'r') as f:
+            projected_atoms = len(extract_show_atoms(f.readlines()))
+        rows.append((summary["answer_sets"], projected_atoms,
+                     round(stages.get("**Clingo time", {}).get("median", 0.0), 2),
+                     round(stages.get("Facet count time", {}).get("median", 0.0), 2)))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(['"#AS"', '"#Projected atom"', '"Time Clingo(Second)"', '"Time Facets count(Second)"'])
+        writer.writerows(sorted(rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python bench_suite.py [instances or dirs ...] [--warmup N] [--repeat N] [--engine E]")
+    parser.add_argument("instances", nargs="*",
+                        help=".lp files or directories of them, default ../input_instance")
+    parser.add_argument("--warmup", type=int, default=1, help="unrecorded rounds before measuring")
+    parser.add_argument("--repeat", type=int, default=5, help="measured rounds")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="instances run concurrently, more than 1 adds noise to timings")
+    parser.add_argument("--timeout", type=float, help="wall-clock seconds per run")
+    parser.add_argument("--memory-mb", type=int, help="address space limit per run")
+    parser.add_argument("--engine", choices=["fasb", "fasb-session", "clingo", "single-pass", "matrix"],
+                        default="fasb")
+    parser.add_argument("--jobs", type=int, default=1, help="facet worker processes inside each run")
+    parser.add_argument("--output",
+                        help="results path without extension, .json and .csv are written, "
+                             "default ../log/bench_<date>")
+    parser.add_argument("--plot-csv", nargs="?", const=PLOT_CSV,
+                        help="also write medians in the dataforplot.csv layout (default ../plot/dataforplot.csv)")
+    args = parser.parse_args()
+    if args.repeat < 1 or args.warmup < 0:
+        parser.error("--repeat must be positive and --warmup not negative")
+
+    stamp = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+    output = args.output or os.path.join(LOG_DIR, f"bench_{stamp}")
+    log_dir = output + "_logs"
+    os.makedirs(log_dir, exist_ok=True)
+    instances = collect_instances(args.instances)
+    # The facet cache would turn repetitions into cache hits, so it stays off
+    options = {"engine": args.engine, "jobs": args.jobs, "quiet": True,
+               "cache_dir": None, "cache_size": None}
+    settings = {"engine": args.engine, "jobs": args.jobs, "warmup": args.warmup, "repeat": args.repeat,
+                "workers": args.workers, "timeout": args.timeout, "memory_mb": args.memory_mb}
+
+    suite = run_suite(instances, options, args.warmup, args.repeat, args.workers,
+                      args.timeout, args.memory_mb, log_dir)
+    write_json(output + ".json", suite, settings)
+    write_csv(output + ".csv", suite)
+    if args.plot_csv:
+        write_plot_csv(args.plot_csv, suite)
+
+    for instance, summary in suite.items():
+        total = summary["stages"].get("Entire program")
+        if total is None:
+            print(f"{os.path.basename(instance):<50} {'/'.join(sorted(set(summary['statuses'])))}")
+        else:
+            print(f"{os.path.basename(instance):<50} {total['median']:>9.4f}s "
+                  f"(min {total['min']:.4f}, max {total['max']:.4f}, iqr {total['iqr']:.4f})")
+    print(f"\nResults in {output}.json and {output}.csv")
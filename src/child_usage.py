@@ -0,0 +1,81 @@
+import os
+import time
+import resource
+import subprocess
+
+# stage -> [calls, spawn ns, user CPU s, system CPU s, peak RSS kB]
+usage = {}
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def add(stage, calls=0, spawn_ns=0, user=0.0, system=0.0, max_rss_kb=0):
+    entry = usage.setdefault(stage, [0, 0, 0.0, 0.0, 0])
+    entry[0] += calls
+    entry[1] += spawn_ns
+    entry[2] += user
+    entry[3] += system
+    entry[4] = max(entry[4], max_rss_kb)
+
+
+def run(stage, command, **kwargs):
+    """subprocess.run(command, capture_output=True, text=True, check=True), accounted to stage.
+
+    CPU times are getrusage(RUSAGE_CHILDREN) deltas, exact as long as this
+    process reaps one child at a time. RUSAGE_CHILDREN only keeps the
+    largest RSS of any child, so a call's peak is known when it raised it.
+    """
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    spawn_start = time.perf_counter_ns()
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs) as proc:
+        spawn_ns = time.perf_counter_ns() - spawn_start
+        stdout, stderr = proc.communicate()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    add(stage, 1, spawn_ns, after.ru_utime - before.ru_utime, after.ru_stime - before.ru_stime,
+        after.ru_maxrss if after.ru_maxrss > before.ru_maxrss else 0)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, proc.returncode, stdout, stderr)
+
+
+def spawn(stage, command, **kwargs):
+    """subprocess.Popen for a long-lived child, its start-up accounted to stage."""
+    spawn_start = time.perf_counter_ns()
+    proc = subprocess.Popen(command, **kwargs)
+    add(stage, 1, time.perf_counter_ns() - spawn_start)
+    return proc
+
+
+def sample_process(stage, pid):
+    """Account CPU and peak RSS of a live child from /proc, e.g. a REPL before it is closed."""
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # fields after the parenthesised command name, utime and stime are 14 and 15
+            fields = f.read().rpartition(')')[2].split()
+        with open(f"/proc/{pid}/status", 'r') as f:
+            peak = next((int(line.split()[1]) for line in f if line.startswith("VmHWM:")), 0)
+    except (OSError, ValueError):
+        return
+    add(stage, user=int(fields[11]) / CLOCK_TICKS, system=int(fields[12]) / CLOCK_TICKS, max_rss_kb=peak)
+
+
+def snapshot():
+    return {stage: list(entry) for stage, entry in usage.items()}
+
+
+def merge(other):
+    for stage, (calls, spawn_ns, user, system, max_rss_kb) in other.items():
+        add(stage, calls, spawn_ns, user, system, max_rss_kb)
+
+
+def reset():
+    usage.clear()
+
+
+def report():
+    """Lines of per-stage child usage, for the profile printout."""
+    lines = []
+    for stage, (calls, spawn_ns, user, system, max_rss_kb) in sorted(usage.items(), key=lambda item: -item[1][2]):
+        spawn_avg = spawn_ns / calls / 1e6 if calls else 0.0
+        lines.append(f"{stage:<40}: calls {calls:<7} user {user:9.4f}s  sys {system:9.4f}s  "
+                     f"spawn avg {spawn_avg:7.3f}ms  peak RSS {max_rss_kb / 1024:8.1f}MB")
+    return lines
@@ -0,0 +1,125 @@
+import time
+
+import clingo
+
+import solver_stats
+
+
+def strip_projection(content):
+    """Drop #project directives, same filter as create_modified_program."""
+    return ''.join(line for line in content if not line.lstrip().startswith('#project'))
+
+
+def solve_consequences(ctl, enum_mode, assumptions=()):
+    """Return brave/cautious consequences over shown atoms, None if unsatisfiable."""
+    ctl.configuration.solve.enum_mode = enum_mode
+    consequences = None
+    with ctl.solve(yield_=True, assumptions=list(assumptions)) as handle:
+        # clingo refines the consequences model by model, the last one is final
+        for model in handle:
+            consequences = model.symbols(shown=True)
+    if solver_stats.per_query:
+        solver_stats.record("Facet query", ctl)
+    return consequences
+
+
+def solve_facets(ctl, assumptions=()):
+    """Return sorted facets (brave minus cautious consequences) of a grounded ctl."""
+    brave = solve_consequences(ctl, "brave", assumptions)
+    if brave is None:
+        return []
+    cautious = set(solve_consequences(ctl, "cautious", assumptions))
+    return sorted(str(atom) for atom in brave if atom not in cautious)
+
+
+def ground_facet_program(projected_file, stage="Facet query"):
+    """Ground the projected program once (without #project) for per-cell facet queries.
+
+    --stats keeps totals over all solve calls, solver_stats.record_totals
+    reads them once when the stage ends.
+    """
+    with open(projected_file, 'r') as f:
+        content = f.readlines()
+    ctl = clingo.Control(["0", "--stats"])
+    ctl.add("base", [], strip_projection(content))
+    ground_start = time.perf_counter()
+    ctl.ground([("base", [])])
+    solver_stats.record_ground(stage, time.perf_counter() - ground_start)
+    return ctl
+
+
+def cell_assumptions(ctl, in_atoms, ex_atoms):
+    """Translate ':- not a.' / ':- a.' constraints into solve assumptions.
+
+    Returns None when an included atom does not occur in the ground program,
+    i.e. the constrained program has no answer set. clingo would silently
+    ignore such an assumption instead.
+    """
+    assumptions = []
+    for atom in in_atoms:
+        symbol = clingo.parse_term(atom)
+        if ctl.symbolic_atoms[symbol] is None:
+            return None
+        assumptions.append((symbol, True))
+    for atom in ex_atoms:
+        symbol = clingo.parse_term(atom)
+        if ctl.symbolic_atoms[symbol] is not None:
+            assumptions.append((symbol, False))
+    return assumptions
+
+
+def facets_under_assumptions(ctl, in_atoms, ex_atoms):
+    """Facets of the cell where in_atoms hold and ex_atoms do not, on a grounded ctl."""
+    assumptions = cell_assumptions(ctl, in_atoms, ex_atoms)
+    if assumptions is None:
+        return []
+    return solve_facets(ctl, assumptions)
+
+
+def answer_count_under_assumptions(ctl, in_atoms, ex_atoms):
+    """Number of answer sets where in_atoms hold and ex_atoms do not, fasb '#!'."""
+    assumptions = cell_assumptions(ctl, in_atoms, ex_atoms)
+    if assumptions is None:
+        return 0
+    ctl.configuration.solve.enum_mode = "auto"
+    with ctl.solve(yield_=True, assumptions=assumptions) as handle:
+        return sum(1 for _ in handle)
+
+
+def facet_counts_under_assumptions(ctl, in_atoms, ex_atoms):
+    """Facet count left after activating each facet, fasb '#??', on a grounded ctl.
+
+    Counts include both polarities like matrix_facet_counts, keys are 'a'
+    for activating a and '~a' for excluding it.
+    """
+    counts = {}
+    for facet in facets_under_assumptions(ctl, in_atoms, ex_atoms):
+        counts[facet] = 2 * len(facets_under_assumptions(ctl, list(in_atoms) + [facet], ex_atoms))
+        counts[f"~{facet}"] = 2 * len(facets_under_assumptions(ctl, in_atoms, list(ex_atoms) + [facet]))
+    return counts
+
+
+def facets_by_projection(projected_file, show_atoms):
+    """Facets of every projected cell from a single enumeration of all answer sets.
+
+    Answer sets are grouped by the projected atoms they contain; a cell's
+    facets are the shown atoms in the union but not in the intersection of
+    its group. Returns {frozenset of included projected atoms: sorted facets}.
+    """
+    ctl = ground_facet_program(projected_file, "Single-pass")
+    projected = frozenset(clingo.parse_term(atom) for atom in show_atoms)
+    # signature -> [union, intersection] of the group's answer sets
+    groups = {}
+    with ctl.solve(yield_=True) as handle:
+        for model in handle:
+            atoms = frozenset(model.symbols(shown=True))
+            signature = projected & atoms
+            group = groups.get(signature)
+            if group is None:
+                groups[signature] = [atoms, atoms]
+            else:
+                group[0] = group[0] | atoms
+                group[1] = group[1] & atoms
+    solver_stats.record("Single-pass", ctl)
+    return {frozenset(str(atom) for atom in signature): sorted(str(atom) for atom in union - intersection)
+            for signature, (union, intersection) in groups.items()}
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from clingo_facets import strip_projection
+
+# Cache settings, cache_path None disables the cache
+cache_path = None
+max_entries = 100000
+# One connection per process, reopened after fork in pool workers
+connection = None
+connection_pid = None
+# Program hashes per (file, mtime)
+program_hashes = {}
+cache_hits = 0
+cache_misses = 0
+
+# Entries are evicted in batches, not on every insert
+EVICT_EVERY = 1000
+puts_since_evict = 0
+
+
+def configure(cache_dir, size=100000):
+    """Enable the on-disk cache under cache_dir, bounded to size entries."""
+    global cache_path, max_entries
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, "facets.sqlite")
+    max_entries = size
+
+
+def get_connection():
+    global connection, connection_pid
+    if connection is None or connection_pid != os.getpid():
+        connection = sqlite3.connect(cache_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS facets ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS facets_last_used ON facets(last_used)")
+        connection.commit()
+        connection_pid = os.getpid()
+    return connection
+
+
+def program_hash(projected_file):
+    """sha256 of the program without #project lines, blank lines and indentation."""
+    stamp = (projected_file, os.path.getmtime(projected_file))
+    if stamp not in program_hashes:
+        with open(projected_file, 'r') as f:
+            content = f.readlines()
+        lines = [line.strip() for line in strip_projection(content).splitlines()]
+        text = '\n'.join(line for line in lines if line)
+        program_hashes[stamp] = hashlib.sha256(text.encode()).hexdigest()
+    return program_hashes[stamp]
+
+
+def cell_key(kind, projected_file, in_atoms, ex_atoms, route_in=(), route_ex=()):
+    """Content address of one facet query, None when the cache is disabled.
+
+    The navigation route is order independent, so it is keyed as a set.
+    """
+    if cache_path is None:
+        return None
+    payload = json.dumps([kind,
+                          program_hash(projected_file),
+                          sorted(in_atoms),
+                          sorted(ex_atoms),
+                          sorted(route_in),
+                          sorted(route_ex)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get(key):
+    """Return the cached value for key, None on a miss."""
+    global cache_hits, cache_misses
+    if key is None:
+        return None
+    conn = get_connection()
+    row = conn.execute("SELECT value FROM facets WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        cache_misses += 1
+        return None
+    cache_hits += 1
+    conn.execute("UPDATE facets SET last_used = ? WHERE key = ?", (time.time(), key))
+    conn.commit()
+    return json.loads(row[0])
+
+
+def put(key, value):
+    global puts_since_evict
+    if key is None:
+        return
+    conn = get_connection()
+    conn.execute("INSERT OR REPLACE INTO facets (key, value, last_used) VALUES (?, ?, ?)",
+                 (key, json.dumps(value), time.time()))
+    conn.commit()
+    puts_since_evict += 1
+    if puts_since_evict >= EVICT_EVERY:
+        evict()
+
+
+def evict():
+    """Drop least recently used entries beyond max_entries."""
+    global puts_since_evict
+    puts_since_evict = 0
+    if cache_path is None:
+        return
+    conn = get_connection()
+    (count,) = conn.execute("SELECT COUNT(*) FROM facets").fetchone()
+    if count > max_entries:
+        conn.execute("DELETE FROM facets WHERE key IN "
+                     "(SELECT key FROM facets ORDER BY last_used LIMIT ?)",
+                     (count - max_entries,))
+        conn.commit()
+
+
+def snapshot():
+    return cache_hits, cache_misses
+
+
+def merge(other):
+    global cache_hits, cache_misses
+    cache_hits += other[0]
+    cache_misses += other[1]
+
+
+def reset():
+    global cache_hits, cache_misses
+    cache_hits = 0
+    cache_misses = 0
+
+
+def close():
+    global connection, connection_pid
+    # Pool workers never get here, so trim from the parent at the end of a run
+    if cache_path is not None:
+        evict()
+    if connection is not None and connection_pid == os.getpid():
+        connection.close()
+    connection = None
+    connection_pid = None
@@ -0,0 +1,189 @@
+import sys
+import argparse
+
+from clingo_facets import ground_facet_program, facets_under_assumptions, cell_assumptions
+
+# Step modes of '$$', switched with "' <mode>"
+MODES = {
+    "go": "strictly goal oriented",
+    "min#f": "minimize facet count",
+    "max#f": "maximize facet count",
+}
+
+COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class FsbSession:
+    """In-process interpreter for the fasb command subset used by our .fsb scripts.
+
+    Runs against one grounded clingo.Control; the route of activated facets
+    is passed to every query as solve assumptions. Supported commands:
+    '#?', '?', '#??', '+ facets ...', '-', '@', '!', '! n', '#!', '$$',
+    "' go|min#f|max#f", ':mode' and loops '\\ <op> #f <n> | <commands> .'.
+    """
+
+    def __init__(self, projected_file):
+        self.ctl = ground_facet_program(projected_file)
+        # activated facets in order, '~a' excludes a
+        self.route = []
+        self.mode = "go"
+        self.facet_lists = {}
+
+    def split_route(self, route):
+        in_atoms = [atom for atom in route if not atom.startswith("~")]
+        ex_atoms = [atom[1:] for atom in route if atom.startswith("~")]
+        return in_atoms, ex_atoms
+
+    def facets(self, route=None):
+        route = self.route if route is None else route
+        key = frozenset(route)
+        if key not in self.facet_lists:
+            in_atoms, ex_atoms = self.split_route(route)
+            self.facet_lists[key] = facets_under_assumptions(self.ctl, in_atoms, ex_atoms)
+        return self.facet_lists[key]
+
+    def facet_count(self, route=None):
+        """fasb counts facets in both polarities, twice the number of facet atoms."""
+        return 2 * len(self.facets(route))
+
+    def answer_sets(self, limit=0):
+        in_atoms, ex_atoms = self.split_route(self.route)
+        assumptions = cell_assumptions(self.ctl, in_atoms, ex_atoms)
+        if assumptions is None:
+            return
+        self.ctl.configuration.solve.enum_mode = "auto"
+        with self.ctl.solve(yield_=True, assumptions=assumptions) as handle:
+            for count, model in enumerate(handle, start=1):
+                yield sorted(str(atom) for atom in model.symbols(shown=True))
+                if count == limit:
+                    break
+
+    def step(self):
+        """Activate the facet chosen by the current mode, None if there is none.
+
+        go and min#f take the activation leaving the fewest facets (largest
+        uncertainty reduction), max#f the one leaving the most.
+        """
+        candidates = []
+        for facet in self.facets():
+            for activation in (facet, f"~{facet}"):
+                candidates.append((self.facet_count(self.route + [activation]), activation))
+        if not candidates:
+            return None
+        if self.mode == "max#f":
+            count, activation = max(candidates, key=lambda candidate: candidate[0])
+        else:
+            count, activation = min(candidates, key=lambda candidate: candidate[0])
+        self.route.append(activation)
+        return activation
+
+    def execute(self, command):
+        """Run one command line and return its output lines."""
+        command = command.strip()
+        if not command or command.startswith("%"):
+            return []
+        if command.startswith("\\"):
+            return self.loop(command)
+        return self.execute_single(command)
+
+    def loop(self, command):
+        """'\\ <op> #f <n> | <commands> .' repeats commands while the facet count satisfies op n."""
+        condition, _, rest = command[1:].partition("|")
+        body, _, after = rest.partition(".")
+        op, counter, bound = condition.split()
+        if counter != "#f" or op not in COMPARISONS:
+            return [f"unknown loop condition: {condition.strip()}"]
+        output = []
+        while COMPARISONS[op](self.facet_count(), int(bound)):
+            route_length = len(self.route)
+            output.extend(self.execute(body))
+            if len(self.route) == route_length:
+                # the body made no progress, stop instead of spinning
+                break
+        output.extend(self.execute(after))
+        return output
+
+    def execute_single(self, command):
+        if command == "#?":
+            return [str(self.facet_count())]
+        if command == "?":
+            return [" ".join(self.facets())]
+        if command == "#??":
+            output = []
+            for facet in self.facets():
+                for activation in (facet, f"~{facet}"):
+                    output.append(f"{activation} {self.facet_count(self.route + [activation])}")
+            return output
+        if command.startswith("+"):
+            return self.activate(command[1:].split())
+        if command == "-":
+            if self.route:
+                self.route.pop()
+            return []
+        if command == "@":
+            return [" ".join(self.route)]
+        if command == "#!":
+            return [str(sum(1 for _ in self.answer_sets()))]
+        if command.startswith("!"):
+            limit = int(command[1:]) if command[1:].strip() else 0
+            output = []
+            for count, atoms in enumerate(self.answer_sets(limit), start=1):
+                output.append(f"Answer {count}:")
+                output.append(" ".join(atoms))
+            return output
+        if command == "$$":
+            activation = self.step()
+            return [activation] if activation is not None else []
+        if command.startswith("'"):
+            mode = command[1:].strip()
+            if mode not in MODES:
+                return [f"unknown mode: {mode}"]
+            self.mode = mode
+            return [MODES[mode]]
+        if command == ":mode":
+            return [MODES[self.mode]]
+        return [f"unknown command: {command}"]
+
+    def activate(self, words):
+        # '+ facets a b' and '+ a b' both activate a and b
+        if words and words[0] == "facets":
+            words = words[1:]
+        output = []
+        for activation in words:
+            atom = activation[1:] if activation.startswith("~") else activation
+            if atom not in self.facets():
+                output.append(f"{activation} is not a facet under the current route")
+                continue
+            self.route.append(activation)
+        return output
+
+
+def run_script(session, lines):
+    output = []
+    for line in lines:
+        output.extend(session.execute(line))
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python fsb_interpreter.py as_r_file.lp [0] [script.fsb]")
+    parser.add_argument("projected_file")
+    parser.add_argument("args", nargs="*", help="fasb-style model count (ignored) and script file")
+    args = parser.parse_args()
+    scripts = [arg for arg in args.args if not arg.isdigit()]
+    session = FsbSession(args.projected_file)
+    if scripts:
+        with open(scripts[0], 'r') as f:
+            print("\n".join(run_script(session, f.readlines())))
+    else:
+        # REPL: one command per line on stdin
+        for line in sys.stdin:
+            for output_line in session.execute(line):
+                print(output_line, flush=True)
@@ -6,23 +6,71 @@ import os
 import time
 from datetime import datetime
 from collections import defaultdict
+import argparse
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import queue
+import threading
+from collections import deque, OrderedDict
+import itertools
+import multiprocessing
+from clingo_facets import (ground_facet_program, facets_under_assumptions, facet_counts_under_assumptions,
+                           answer_count_under_assumptions, facets_by_projection, cell_assumptions)
+from norm_proj_fasb import get_inst_fasb, call_fasb_with_input, clean_fasb_lines, close_fasb
+import facet_cache
+from answer_store import AnswerSetStore, DiskAnswerSetStore
+from result_sink import open_sinks
+import span_profiler
+import child_usage
+import solver_stats
+import slow_cells
+import progress
+import metrics_export
 
 # Profiling storage
-# Dictionary to accumulate profile durations
+# Flat total seconds per key, the nested spans live in span_profiler
 profile_data = defaultdict(float)
-# Dictionary to store start times per key
-profile_start_times = {}
+
+# Grounded clingo controls for in-process facet queries, one per input file
+facet_controls = {}
+# Warm fasb REPL processes, one per input file
+fasb_sessions = {}
+# Scratch program and script written for fasb, per process in worker pools
+scratch_program = "modified.lp"
+scratch_script = "facet_count_act.fsb"
+# Facet engine chosen on the command line. Navigation follows it, clingo,
+# fasb-session and single-pass navigate on the in-process clingo controls
+facet_engine = "fasb"
+CONTROL_ENGINES = ("clingo", "fasb-session", "single-pass")
+# Duration of the last "Facet cell" span in seconds, the per-cell time the sinks report;
+# None when facets are not computed per cell (single-pass)
+last_cell_seconds = None
+# Packed answer-set matrices for --engine matrix, one per input file
+answer_matrices = {}
+# Routes remembered per facet_navigation session
+NAV_CACHE_SIZE = 256
+# Background workers computing child routes during navigation, 0 disables
+prefetch_jobs = 0
+# Prefetch every child route up to this many facets, else only the first ones
+PREFETCH_ALL = 16
+PREFETCH_WIDTH = 8
+# Projected models sampled to pick the atoms that split enumeration into cubes, and the
+# seconds the sample may take, it must not turn into a sequential enumeration
+SHARD_SAMPLE = 256
+SHARD_SAMPLE_SECONDS = 0.5
+# clingo --parallel-mode for enumeration ("<threads>,<compete|split>"), None solves single threaded
+solver_parallel = None
 
 def start_profile(key):
-    """Start profiling for a specific key."""
-    profile_start_times[key] = time.time()
+    """Start profiling for a specific key, nested in the keys open on this thread."""
+    span_profiler.start(key)
 
 def record_profile(key):
     """Record elapsed time for a specific key."""
-    if key in profile_start_times:
-        elapsed = time.time() - profile_start_times[key]
-        profile_data[key] += elapsed
-        del profile_start_times[key]  # Optional: remove to prevent reuse
+    elapsed = span_profiler.stop(key)
+    if elapsed is not None:
+        profile_data[key] += elapsed / 1e9
     else:
         print(f"Warning: No start time recorded for key '{key}'")    
 
@@ -32,8 +80,16 @@ def print_profile():
     if total == 0:
         print("No profiling data recorded for 'Entire program'.")
         return
-    for operation, duration in sorted(profile_data.items(), key=lambda x: -x[1]):
-        print(f"{operation:<30}: {duration:.4f}s ({duration/total*100:.1f}%)")
+    for line in span_profiler.report("Entire program"):
+        print(line)
+    if child_usage.usage:
+        print("\n⚙️  Child processes:")
+        for line in child_usage.report():
+            print(line)
+    if solver_stats.stats:
+        print("\n🧩 Solver statistics:")
+        for line in solver_stats.report():
+            print(line)
     
 
 def get_user_limits():
@@ -62,7 +118,8 @@ def get_user_limits():
             else:
                 limit = int(input("Enter maximum time in seconds: "))
             if limit > 0:
-                return choice, limit
+                # 1 count limit, 2 time limit, as compared in projected_models
+                return int(choice), limit
             print("Limit must be a positive integer.")
         except ValueError:
             print("Please enter a valid integer.")
@@ -126,7 +183,7 @@ def create_modified_program(original_file, constraints):
     ]
     # Add new constraints
     modified_content = ''.join(filtered_content) + '\n' + '\n'.join(constraints)
-    temp_filename = "modified.lp"
+    temp_filename = scratch_program
     with open(temp_filename, 'w') as f:
         f.write(modified_content)
 #    record_profile("Create modified program")
@@ -138,7 +195,7 @@ def execute_fasb(modified_file):
     """Execute the fasb command on the modified program."""
     fasb_command = ["fasb", modified_file, "0", "facet_count.fsb"]
     try:
-        result = subprocess.run(fasb_command, capture_output=True, text=True, check=True)
+        result = child_usage.run("**FASB execution", fasb_command)
         #print("FASB execution output:")
         #print(result.stdout)
 #        record_profile("FASB execution")
@@ -159,11 +216,11 @@ def execute_fasb_with_activate(modified_file, nv_in_atoms,nv_ex_atoms):
         fasb_args = f"#?\n?\n"  # Activate facets, REPL-style input as a string        
     # Debug: print the arguments being sent to fasb
     print(f"\nFASB Arguments:\n{fasb_args}")
-    with open("facet_count_act.fsb", "w") as file:
+    with open(scratch_script, "w") as file:
         file.write(fasb_args)
-    fasb_command = ["fasb", modified_file, "0", "facet_count_act.fsb"]
+    fasb_command = ["fasb", modified_file, "0", scratch_script]
     try:
-        result = subprocess.run(fasb_command, capture_output=True, text=True, check=True)
+        result = child_usage.run("FASB execution", fasb_command)
         print("FASB execution output:")
         print(result.stdout)
         record_profile("FASB execution")
@@ -192,11 +249,11 @@ def execute_fasb_with_fcuef(modified_file, nv_in_atoms,nv_ex_atoms):
     # Debug: print the arguments being sent to fasb
     #facet counts under each facet ->  #??
     print(f"\nFASB Arguments:\n{fasb_args}")
-    with open("facet_count_act.fsb", "w") as file:
+    with open(scratch_script, "w") as file:
         file.write(fasb_args)
-    fasb_command = ["fasb", modified_file, "0", "facet_count_act.fsb"]
+    fasb_command = ["fasb", modified_file, "0", scratch_script]
     try:
-        result = subprocess.run(fasb_command, capture_output=True, text=True, check=True)
+        result = child_usage.run("FASB execution", fasb_command)
         # print("FASB execution output:")
         # print(result.stdout)
         record_profile("FASB execution")
@@ -211,6 +268,11 @@ def execute_fasb_with_fcuef(modified_file, nv_in_atoms,nv_ex_atoms):
 def facet_processing(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file):
     facets_count = 0
     facets_list = []
+    cache_key = facet_cache.cell_key("facets", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                     nv_in_atoms, nv_ex_atoms)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     start_profile("Generate constraints")
     constraints = generate_constraints(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms)
@@ -244,6 +306,7 @@ def facet_processing(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_at
         return []
 
     if facets_count == 0:
+        facet_cache.put(cache_key, [])
         return []
 
     if facets_count > 0 and len(lines) < 3:
@@ -255,13 +318,143 @@ def facet_processing(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_at
         print(f"Warning: Expected {facets_count} exclusive facets, but found {len(facets_list)}.")
         return []
 
+    facet_cache.put(cache_key, facets_list)
+    return facets_list
+
+
+def get_facet_control(projected_file):
+    if projected_file not in facet_controls:
+        start_profile("Ground facet program")
+        facet_controls[projected_file] = ground_facet_program(projected_file)
+        record_profile("Ground facet program")
+    return facet_controls[projected_file]
+
+
+def facet_processing_clingo(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file):
+    """In-process counterpart of facet_processing, no modified.lp and no fasb call.
+
+    The program is grounded once per run, each cell is a solve() call with
+    assumptions in place of the generated constraints.
+    """
+    cache_key = facet_cache.cell_key("facets", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                     nv_in_atoms, nv_ex_atoms)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    start_profile("**Clingo facet execution")
+    facets_list = facets_under_assumptions(get_facet_control(projected_file),
+                                           list(filtered_in_atoms) + list(nv_in_atoms),
+                                           filtered_ex_atoms)
+    record_profile("**Clingo facet execution")
+    facet_cache.put(cache_key, facets_list)
     return facets_list
 
 
+def facet_processing_session(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file):
+    """Counterpart of facet_processing on one persistent fasb process per input file.
+
+    The cell is activated as a route of facets, queried with '#?' and '?',
+    and deactivated again, instead of spawning fasb on a modified program.
+    """
+    cache_key = facet_cache.cell_key("facets", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                     nv_in_atoms, nv_ex_atoms)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    proc = fasb_sessions.get(projected_file)
+    if proc is None or proc.poll() is not None:
+        # first cell, or the session was killed after a lost reply
+        start_profile("Start fasb session")
+        proc = get_inst_fasb(create_modified_program(projected_file, []))
+        record_profile("Start fasb session")
+        if proc is None:
+            # every cell would come out with 0 facets
+            raise RuntimeError(f"Could not start a fasb session for {projected_file}, is fasb on PATH?")
+        fasb_sessions[projected_file] = proc
+
+    route = list(filtered_in_atoms) + list(nv_in_atoms) + [f"~{atom}" for atom in filtered_ex_atoms]
+    start_profile("**FASB execution")
+    activated = []
+    if route:
+        call_fasb_with_input(f"+ facets {' '.join(route)}\n", proc)
+        # fasb rejects facets that are no longer facets under the route so far. The cell is
+        # a projected answer set, so those are implied by the others, but they must not be
+        # deactivated: each '-' pops one activated facet.
+        route_tokens = set(" ".join(clean_fasb_lines(call_fasb_with_input("@\n", proc))).split())
+        activated = [facet for facet in route if facet in route_tokens]
+    count_lines = clean_fasb_lines(call_fasb_with_input("#?\n", proc))
+    facet_lines = clean_fasb_lines(call_fasb_with_input("?\n", proc))
+    for _ in activated:
+        call_fasb_with_input("-\n", proc)
+    record_profile("**FASB execution")
+
+    try:
+        facets_count = int(count_lines[-1])
+    except (IndexError, ValueError):
+        print("Invalid or missing facet count format.")
+        return []
+
+    if facets_count == 0:
+        facet_cache.put(cache_key, [])
+        return []
+
+    facets_list = sorted(" ".join(facet_lines).split())
+    if len(facets_list) != facets_count / 2:
+        print(f"Warning: Expected {facets_count} exclusive facets, but found {len(facets_list)}.")
+        return []
+
+    facet_cache.put(cache_key, facets_list)
+    return facets_list
+
+
+def get_answer_matrix(projected_file):
+    # numpy is only needed for --engine matrix
+    from answer_matrix import build_answer_matrix
+    if projected_file not in answer_matrices:
+        start_profile("Build answer matrix")
+        answer_matrices[projected_file] = build_answer_matrix(projected_file)
+        record_profile("Build answer matrix")
+    return answer_matrices[projected_file]
+
+
+def facet_processing_matrix(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file):
+    """Counterpart of facet_processing on the packed answer-set matrix, no solver call per cell."""
+    from answer_matrix import matrix_facets
+    cache_key = facet_cache.cell_key("facets", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                     nv_in_atoms, nv_ex_atoms)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    matrix = get_answer_matrix(projected_file)
+    start_profile("**Matrix facet execution")
+    facets_list = matrix_facets(matrix, list(filtered_in_atoms) + list(nv_in_atoms), filtered_ex_atoms)
+    record_profile("**Matrix facet execution")
+    facet_cache.put(cache_key, facets_list)
+    return facets_list
+
+
+def close_fasb_sessions():
+    for proc in fasb_sessions.values():
+        if proc is not None:
+            close_fasb(proc)
+    fasb_sessions.clear()
+
+
 def facet_activate(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file):
     facets_count=0
     facets_list=[]
     print("\nFacet Count Processing:")
+    if facet_engine == "matrix":
+        return facet_processing_matrix(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms,
+                                       projected_file)
+    if facet_engine in CONTROL_ENGINES:
+        return facet_processing_clingo(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms,
+                                       projected_file)
+    cache_key = facet_cache.cell_key("activate", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                     nv_in_atoms, nv_ex_atoms)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
     fc_in_atoms=[]
     fc_ex_atoms=[]
     start_profile("Generate constraints")
@@ -292,6 +485,7 @@ def facet_activate(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,p
         return []
     if facets_count == 0:
         # print("No facets available.")        
+        facet_cache.put(cache_key, [])
         return []
     if facets_count > 0 and len(lines) < 3:
         print("FASB output format unexpected.")
@@ -300,6 +494,7 @@ def facet_activate(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,p
     if len(facets_list) != facets_count/2:
         print(f"Warning: Expected {facets_count} exclusive facets, but found {len(facets_list)}.")
         return []
+    facet_cache.put(cache_key, facets_list)
     return facets_list  
 
 # def facet_navigation(facet_list,
@@ -363,9 +558,64 @@ def facet_activate(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,p
 #         else:
 #             print("Invalid command. Please enter c, n, p, or q.")      
 
-def facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file):                 
+def route_key(nv_in_atoms, nv_ex_atoms):
+    """Activation order does not change the facets, so routes are keyed as sets."""
+    return frozenset(nv_in_atoms), frozenset(nv_ex_atoms)
+
+
+def remember_route(nav_cache, key, facet_list):
+    nav_cache[key] = facet_list
+    nav_cache.move_to_end(key)
+    while len(nav_cache) > NAV_CACHE_SIZE:
+        nav_cache.popitem(last=False)
+
+
+def start_prefetch(pool, prefetched, nav_cache, facet_list,
+                   filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file):
+    """Compute the child routes of the current route in the background.
+
+    Finished results move into nav_cache and pending work for the previous
+    route is cancelled. Short facet lists are prefetched completely, long
+    ones only for their first facets.
+    """
+    for key in list(prefetched):
+        future = prefetched[key]
+        if future.done() and not future.cancelled() and future.exception() is None:
+            remember_route(nav_cache, key, future.result())
+            del prefetched[key]
+        elif future.cancel():
+            del prefetched[key]
+    candidates = facet_list if len(facet_list) <= PREFETCH_ALL else facet_list[:PREFETCH_WIDTH]
+    for facet in candidates:
+        child_in_atoms = list(nv_in_atoms) + [facet]
+        key = route_key(child_in_atoms, nv_ex_atoms)
+        if key in nav_cache or key in prefetched:
+            continue
+        prefetched[key] = pool.submit(facet_activate, filtered_ex_atoms, filtered_in_atoms,
+                                      nv_ex_atoms, child_in_atoms, projected_file)
+
+
+def facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file,nav_cache=None,
+                   prefetched=None):                 
     print("**** Outputting from command facet_nav_call")
-    facet_list=facet_activate(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file) 
+    key = route_key(nv_in_atoms, nv_ex_atoms)
+    if nav_cache is not None and key in nav_cache:
+        nav_cache.move_to_end(key)
+        facet_list = nav_cache[key]
+    elif prefetched is not None and key in prefetched:
+        # Already computed or running in the background, wait for it
+        start_profile("Wait for prefetch")
+        facet_list = prefetched.pop(key).result()
+        record_profile("Wait for prefetch")
+        remember_route(nav_cache, key, facet_list)
+    else:
+        facet_list=facet_activate(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file) 
+        if nav_cache is not None:
+            remember_route(nav_cache, key, facet_list)
+    print_nav_state(filtered_ex_atoms, filtered_in_atoms, nv_in_atoms, facet_list)
+    return facet_list
+
+def print_nav_state(filtered_ex_atoms, filtered_in_atoms, nv_in_atoms, facet_list):
     print(f"\n✅Navigation path {nv_in_atoms}:")  
     print("Included Projected Atoms: ", filtered_in_atoms)
     print("Excluded Projected Atoms: ", filtered_ex_atoms)
@@ -373,15 +623,45 @@ def facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,p
     #print("Navigation Exclusive Atoms: ", nv_ex_atoms)
     print("Facet Count: ",len(facet_list))
     print_facets(facet_list)
-    return facet_list
+
+def facet_counts_in_process(filtered_ex_atoms, filtered_in_atoms, nv_in_atoms, projected_file):
+    """fasb '#??' counts on the answer matrix or the grounded clingo control."""
+    in_atoms = list(filtered_in_atoms) + list(nv_in_atoms)
+    if facet_engine == "matrix":
+        from answer_matrix import matrix_facet_counts
+        start_profile("**Matrix facet execution")
+        counts = matrix_facet_counts(get_answer_matrix(projected_file), in_atoms, filtered_ex_atoms)
+        record_profile("**Matrix facet execution")
+    else:
+        start_profile("**Clingo facet execution")
+        counts = facet_counts_under_assumptions(get_facet_control(projected_file), in_atoms, filtered_ex_atoms)
+        record_profile("**Clingo facet execution")
+    return counts
 
 def facet_count_under_each(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file):
     # This function will count the number of elements under each facet
-    fc_in_atoms=[]
-    fc_ex_atoms=[]
-    constraints = generate_constraints(filtered_ex_atoms, filtered_in_atoms,fc_ex_atoms,fc_in_atoms)
-    modified_file = create_modified_program(projected_file, constraints)
-    stdout=execute_fasb_with_fcuef(modified_file, nv_in_atoms,nv_ex_atoms)
+    if facet_engine == "matrix" or facet_engine in CONTROL_ENGINES:
+        # The in-process engines agree on the counts, so they share cache entries
+        cache_key = facet_cache.cell_key("fcuef_counts", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                         nv_in_atoms, nv_ex_atoms)
+        counts = facet_cache.get(cache_key)
+        if counts is None:
+            counts = facet_counts_in_process(filtered_ex_atoms, filtered_in_atoms, nv_in_atoms, projected_file)
+            facet_cache.put(cache_key, counts)
+        for facet, count in counts.items():
+            print(f"{facet}: {count}")
+        return counts
+    cache_key = facet_cache.cell_key("fcuef", projected_file, filtered_in_atoms, filtered_ex_atoms,
+                                     nv_in_atoms, nv_ex_atoms)
+    stdout = facet_cache.get(cache_key)
+    if stdout is None:
+        fc_in_atoms=[]
+        fc_ex_atoms=[]
+        constraints = generate_constraints(filtered_ex_atoms, filtered_in_atoms,fc_ex_atoms,fc_in_atoms)
+        modified_file = create_modified_program(projected_file, constraints)
+        stdout=execute_fasb_with_fcuef(modified_file, nv_in_atoms,nv_ex_atoms)
+        if stdout is not None:
+            facet_cache.put(cache_key, stdout)
     print(stdout)
     
     if stdout is None:
@@ -419,32 +699,80 @@ def facet_count_under_each(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in
 
     #return facets_list
 
+def answer_count_under_route(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file):
+    """Number of answer sets under the navigation route, fasb '#!'."""
+    in_atoms = list(filtered_in_atoms) + list(nv_in_atoms)
+    ex_atoms = list(filtered_ex_atoms) + list(nv_ex_atoms)
+    if facet_engine == "matrix":
+        from answer_matrix import matrix_answer_count
+        start_profile("**Matrix facet execution")
+        count = matrix_answer_count(get_answer_matrix(projected_file), in_atoms, ex_atoms)
+        record_profile("**Matrix facet execution")
+    else:
+        start_profile("**Clingo facet execution")
+        count = answer_count_under_assumptions(get_facet_control(projected_file), in_atoms, ex_atoms)
+        record_profile("**Clingo facet execution")
+    print(f"Answer sets under route: {count}")
+    return count
+
 def facet_navigation(facet_list,filtered_in_atoms,filtered_ex_atoms,projected_file):
     if len(facet_list) == 0:
         print("No facets available for navigation.")
         return
     nv_in_atoms = []
     nv_ex_atoms = []
+    # Facet lists along the current route, undo pops instead of recomputing
+    route_facets = [facet_list]
+    nav_cache = OrderedDict()
+    remember_route(nav_cache, route_key(nv_in_atoms, nv_ex_atoms), facet_list)
+    prefetched = {}
+    if prefetch_jobs > 0:
+        scratch_dir = tempfile.mkdtemp(prefix="prefetch_")
+        pool = ProcessPoolExecutor(max_workers=prefetch_jobs,
+                                   initializer=init_prefetch_worker,
+                                   initargs=(scratch_dir, *cache_settings()))
+    else:
+        pool = None
+    try:
+        navigation_loop(facet_list, filtered_in_atoms, filtered_ex_atoms, projected_file,
+                        nv_in_atoms, nv_ex_atoms, route_facets, nav_cache, pool, prefetched)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def navigation_loop(facet_list, filtered_in_atoms, filtered_ex_atoms, projected_file,
+                    nv_in_atoms, nv_ex_atoms, route_facets, nav_cache, pool, prefetched):
     cnt=0
+    prefetched_route = None
     while True:  
+        if pool is not None and route_key(nv_in_atoms, nv_ex_atoms) != prefetched_route:
+            prefetched_route = route_key(nv_in_atoms, nv_ex_atoms)
+            start_prefetch(pool, prefetched, nav_cache, facet_list,
+                           filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file)
         cnt+=1   
         print("Beg of loop navigation atom",nv_in_atoms)
         print(f"\nNavigation round: {cnt}")
         start_profile("User input")
-        command = input(f"\n 1: Deactivate previous facet \n 2: Deactivate all facets \n 3: Activate new facet \n 4: Facet counts under each facet \n 5: Quit navigation \n Enter command (1/2/3/4/5): ").strip().lower()
+        command = input(f"\n 1: Deactivate previous facet \n 2: Deactivate all facets \n 3: Activate new facet \n 4: Facet counts under each facet \n 5: Quit navigation \n 6: Answer set count under route \n Enter command (1/2/3/4/5/6): ").strip().lower()
         record_profile("User input")
         if command == '1':
             if len(nv_in_atoms) > 0:
                 nv_in_atoms = nv_in_atoms[:-1]  # Remove last activated facet
+                route_facets.pop()
                 print("After pop navigation atom",nv_in_atoms)
-                facet_list=facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file)
+                facet_list = route_facets[-1]
+                print_nav_state(filtered_ex_atoms, filtered_in_atoms, nv_in_atoms, facet_list)
             else:
                 print("No previously activated facets to deactivate.")
                 continue    
         if command == '2':            
             nv_in_atoms = []
             nv_ex_atoms = []
-            facet_list=facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file)
+            del route_facets[1:]
+            facet_list = route_facets[0]
+            print_nav_state(filtered_ex_atoms, filtered_in_atoms, nv_in_atoms, facet_list)
         if command == '3':
             print(f"\nSelect from available facets:\n") 
             for fc_index, facet in enumerate(facet_list):
@@ -461,7 +789,9 @@ def facet_navigation(facet_list,filtered_in_atoms,filtered_ex_atoms,projected_fi
                         continue
                     else:
                         nv_in_atoms.append(facet)  
-                        facet_list=facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file)
+                        facet_list=facet_nav_call(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file,
+                                                  nav_cache,prefetched)
+                        route_facets.append(facet_list)
                         continue
                 else:
                     print("Invalid index. Please select a facet.")
@@ -473,6 +803,9 @@ def facet_navigation(facet_list,filtered_in_atoms,filtered_ex_atoms,projected_fi
             print("**** Outputting from command =4")
             facet_count_under_each(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file)
             continue
+        if command == '6':
+            answer_count_under_route(filtered_ex_atoms,filtered_in_atoms,nv_ex_atoms,nv_in_atoms,projected_file)
+            continue
         if command == '5':
             print("Exiting navigation mode.")
             break
@@ -524,74 +857,207 @@ def facet_navigation(facet_list,filtered_in_atoms,filtered_ex_atoms,projected_fi
 #         else:
 #             print("Invalid command. Please enter c, n, p, or q.")
 
-def answer_set_navigation(all_ans_sets,
-                          all_ans_facets,
-                          all_filtered_in_atoms,
-                          all_filtered_ex_atoms,
-                          projected_file):        
-    if len(all_ans_sets) == 0:
+def answer_set_navigation(ans_store, projected_file):        
+    if len(ans_store) == 0:
         print("No answer set available for navigation.")
         return
     ans_index = 0
     print(f"\nAvailable Answer Set Options:\n")
-    for ans_index, ans_set in enumerate(all_ans_sets):
-        print(f"{ans_index + 1}: {ans_set}")
+    for ans_index in range(len(ans_store)):
+        print(f"{ans_index + 1}: {ans_store.format_answer_set(ans_index)}")
     start_profile("User input")
-    command = input(f"\nSelect Answer Set Index for Navigation [1, ..., {len(all_ans_sets)}]: ")
+    command = input(f"\nSelect Answer Set Index for Navigation [1, ..., {len(ans_store)}]: ")
     record_profile("User input")
     try:
         command_index = int(command)
-        if 1 <= command_index <= len(all_ans_sets):
+        if 1 <= command_index <= len(ans_store):
             selected_index = command_index - 1
-            facet_navigation(all_ans_facets[selected_index],
-                    all_filtered_in_atoms[selected_index],
-                    all_filtered_ex_atoms[selected_index],projected_file)
+            facet_navigation(ans_store.facets(selected_index),
+                    ans_store.in_atoms(selected_index),
+                    ans_store.ex_atoms(selected_index),projected_file)
         else:
             print("Invalid index. Please select a valid answer set.")
     except ValueError:
         print("Invalid input. Please enter a numeric index.")
 
 
-def main(projected_file, limit_type=None, limit_value=None):   
-    navigation_flag=False
-    start_profile("User input")
-    nav_input = input("Do you want to enable navigation mode? (y/n): ").strip().lower()
-    if nav_input == 'y':
-        navigation_flag = True
-    record_profile("User input")            
+def facet_function(engine):
+    """Per-cell facet computation for the selected --engine, timed as a "Facet cell" span."""
+    if engine == "clingo":
+        cell_facets = facet_processing_clingo
+    elif engine == "fasb-session":
+        cell_facets = facet_processing_session
+    elif engine == "matrix":
+        cell_facets = facet_processing_matrix
+    else:
+        cell_facets = facet_processing
 
-    with open(projected_file, 'r') as f:
-        content = f.readlines()
-            
-    #--- Extract show atoms
-    show_atoms = extract_show_atoms(content)
-    if not show_atoms:
-        print("Error: No projection in input ASP. Program bypassed.")
+    def timed_cell_facets(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file):
+        global last_cell_seconds
+        span_profiler.start("Facet cell", included=filtered_in_atoms)
+        try:
+            facet_list = cell_facets(filtered_ex_atoms, filtered_in_atoms, nv_ex_atoms, nv_in_atoms, projected_file)
+        finally:
+            elapsed = span_profiler.stop("Facet cell")
+        last_cell_seconds = elapsed / 1e9
+        slow_cells.observe(projected_file, filtered_in_atoms, filtered_ex_atoms, nv_in_atoms,
+                           elapsed / 1e9, len(facet_list), engine)
+        return facet_list
+    return timed_cell_facets
+
+
+def init_facet_worker(scratch_dir, cache_dir=None, cache_size=None, slow_settings=None, per_query_stats=False):
+    """Give each pool worker its own scratch program so fasb calls do not collide."""
+    global scratch_program, scratch_script
+    scratch_program = os.path.join(scratch_dir, f"modified_{os.getpid()}.lp")
+    scratch_script = os.path.join(scratch_dir, f"facet_count_act_{os.getpid()}.fsb")
+    # --solver-stats reads every facet query in the workers too
+    solver_stats.per_query = per_query_stats
+    if cache_dir is not None:
+        facet_cache.configure(cache_dir, cache_size)
+    if slow_settings is not None:
+        slow_cells.configure(*slow_settings)
+
+
+def init_prefetch_worker(scratch_dir, cache_dir=None, cache_size=None):
+    """Pool worker for navigation prefetch, its output would garble the menu."""
+    init_facet_worker(scratch_dir, cache_dir, cache_size)
+    sys.stdout = open(os.devnull, "w")
+
+
+def cache_settings():
+    """(cache_dir, cache_size) of an enabled facet cache, to set up pool workers."""
+    if facet_cache.cache_path is None:
+        return None, None
+    return os.path.dirname(facet_cache.cache_path), facet_cache.max_entries
+
+
+def facet_worker(task):
+    engine, filtered_ex_atoms, filtered_in_atoms, projected_file = task
+    # Only ship back the time spent on this task
+    profile_data.clear()
+    span_profiler.reset()
+    child_usage.reset()
+    solver_stats.reset()
+    slow_cells.reset()
+    facet_cache.reset()
+    facet_list = facet_function(engine)(filtered_ex_atoms, filtered_in_atoms, [], [], projected_file)
+    if not solver_stats.per_query:
+        # The worker's controls outlive the task, ship only this task's share of their totals
+        for ctl in facet_controls.values():
+            solver_stats.record_new_totals("Facet query", ctl)
+    return facet_list, (dict(profile_data), span_profiler.snapshot(), child_usage.snapshot(),
+                        solver_stats.snapshot(), slow_cells.snapshot(), facet_cache.snapshot(),
+                        last_cell_seconds)
+
+
+def merge_worker_profile(worker_profile):
+    global last_cell_seconds
+    flat_profile, spans, children, solver, slow, cache, last_cell_seconds = worker_profile
+    for key, duration in flat_profile.items():
+        profile_data[key] += duration
+    span_profiler.merge(spans)
+    child_usage.merge(children)
+    solver_stats.merge(solver)
+    slow_cells.merge(slow)
+    facet_cache.merge(cache)
+
+
+def parallel_facet_processing(cells, engine, projected_file, jobs):
+    """Yield the facet lists of all cells, computed on a process pool, in enumeration order.
+
+    Tasks are built lazily from cells and at most 2 * jobs cells are in
+    flight, so a disk-backed answer set store is never read into memory.
+    Worker profile times are summed into profile_data, so they are CPU time
+    across workers and may exceed the wall time of "Facet count time".
+    """
+    scratch_dir = tempfile.mkdtemp(prefix="facets_")
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 initializer=init_facet_worker,
+                                 initargs=(scratch_dir, *cache_settings(), slow_cells.settings(),
+                                           solver_stats.per_query)) as pool:
+            for ex_atoms, in_atoms in cells:
+                pending.append(pool.submit(facet_worker, (engine, ex_atoms, in_atoms, projected_file)))
+                # Emit finished ones in order, wait for the oldest once the window is full
+                while pending and (len(pending) >= 2 * jobs or pending[0].done()):
+                    facet_list, worker_profile = pending.popleft().result()
+                    merge_worker_profile(worker_profile)
+                    yield facet_list
+            while pending:
+                facet_list, worker_profile = pending.popleft().result()
+                merge_worker_profile(worker_profile)
+                yield facet_list
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def enumerate_projected_cells(projected_file, show_atoms, limit_type=None, limit_value=None, cube=()):
+    """Yield (answer_set, filtered_in_atoms, filtered_ex_atoms) for every projected model.
+
+    cube is a list of (projected atom, truth value) pairs the models must agree with.
+    With solver_parallel set, solver threads report models in a racy order and
+    the witness model of a cell depends on which thread found it first. The
+    cells are collected, sorted by their projected assignment, and reported
+    with the witness of a single-threaded solve under that assignment.
+    """
+    cells = solve_projected_cells(projected_file, show_atoms, limit_type, limit_value, cube)
+    if solver_parallel is None:
+        yield from cells
         return
-    else:
-        print(f"\nProjected atoms extracted: {show_atoms}")
+    positions = {atom: position for position, atom in enumerate(show_atoms)}
+    cells = sorted(cells, key=lambda cell: sorted(positions[atom] for atom in cell[1]))
+    witness_ctl = clingo.Control(["1"])
+    witness_ctl.load(projected_file)
+    witness_ctl.ground([("base", [])])
+    for answer_set, filtered_in_atoms, filtered_ex_atoms in cells:
+        yield cell_witness(witness_ctl, filtered_in_atoms, filtered_ex_atoms), filtered_in_atoms, filtered_ex_atoms
 
-    # Initialize solver and counters
-    start_profile("**Clingo time")
-    ctl = clingo.Control(["0", "--project"])
-    #start_profile("Clingo initialization")
+
+def cell_witness(ctl, filtered_in_atoms, filtered_ex_atoms):
+    """First model of a single-threaded solve under the cell's projected assignment."""
+    with ctl.solve(yield_=True, assumptions=cell_assumptions(ctl, filtered_in_atoms, filtered_ex_atoms)) as handle:
+        for model in handle:
+            return model.symbols(shown=True)
+    return []
+
+
+def solve_projected_cells(projected_file, show_atoms, limit_type, limit_value, cube, stage="Enumeration"):
+    options = ["0", "--project"]
+    if solver_parallel is not None:
+        options.append(f"--parallel-mode={solver_parallel}")
+    ctl = clingo.Control(options)
     ctl.load(projected_file)
+    ground_start = time.perf_counter()
     ctl.ground([("base", [])])
-    #record_profile("Clingo initialization")
- 
-    # Solve and process answer sets
+    solver_stats.record_ground(stage, time.perf_counter() - ground_start)
+    assumptions = cell_assumptions(ctl,
+                                   [atom for atom, value in cube if value],
+                                   [atom for atom, value in cube if not value])
+    if assumptions is None:
+        return
+    timer = None
+    if limit_type == 2:
+        # projected_models only checks the time limit when a model arrives
+        timer = threading.Timer(limit_value, ctl.interrupt)
+        timer.start()
+    try:
+        yield from projected_models(ctl, assumptions, show_atoms, limit_type, limit_value)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        # also when the consumer stops early
+        solver_stats.record(stage, ctl)
+
+
+def projected_models(ctl, assumptions, show_atoms, limit_type, limit_value):
     ans_solve_start = time.time()
-    all_ans_sets=[]
-    all_ans_facets=[]
-    all_filtered_in_atoms=[]
-    all_filtered_ex_atoms=[]
-    nv_in_atoms=[]
-    nv_ex_atoms=[]
-    #start_profile("Answer set processing")  
-    with ctl.solve(yield_=True) as handle:
+    ans_count = 0
+    with ctl.solve(yield_=True, assumptions=assumptions) as handle:
         for model in handle:
             if limit_type ==1:
-                if len(all_ans_sets) >= limit_value:
+                if ans_count >= limit_value:
                     print(f"\n🔢 Answer set limit of {limit_value} reached")
                     break
             if limit_type ==2:
@@ -604,58 +1070,428 @@ def main(projected_file, limit_type=None, limit_value=None):
                 answer_set_strs = set(map(str, answer_set))
                 filtered_in_atoms = [atom for atom in show_atoms if atom in answer_set_strs]
                 filtered_ex_atoms = [atom for atom in show_atoms if atom not in answer_set_strs]      
-                all_ans_sets.append(answer_set)
-                all_filtered_in_atoms.append(filtered_in_atoms)
-                all_filtered_ex_atoms.append(filtered_ex_atoms)
-    # End of solving            
-    #record_profile("Answer set processing")                        
-    record_profile("**Clingo time")
-    if len(all_ans_sets) == 0:
-        print("No answer sets found with the specified projected atoms.")
-        return  
+                ans_count += 1
+                yield answer_set, filtered_in_atoms, filtered_ex_atoms
+
+
+def choose_split_atoms(projected_file, show_atoms, shards):
+    """Pick the projected atoms that split a sample of projected models most evenly.
+
+    Only projected atoms that are in the ground program and not facts can
+    split it. The sample is cut off after SHARD_SAMPLE_SECONDS, without a
+    sample the first candidates are taken.
+    """
+    ctl = clingo.Control(["0", "--project"])
+    ctl.load(projected_file)
+    ground_start = time.perf_counter()
+    ctl.ground([("base", [])])
+    solver_stats.record_ground("Shard sampling", time.perf_counter() - ground_start)
+    candidates = []
+    for atom in show_atoms:
+        symbolic_atom = ctl.symbolic_atoms[clingo.parse_term(atom)]
+        if symbolic_atom is not None and not symbolic_atom.is_fact:
+            candidates.append(atom)
+    true_counts = dict.fromkeys(candidates, 0)
+    sampled = 0
+    deadline = time.perf_counter() + SHARD_SAMPLE_SECONDS
+    with ctl.solve(yield_=True, async_=True) as handle:
+        while sampled < SHARD_SAMPLE:
+            handle.resume()
+            if not handle.wait(max(0.0, deadline - time.perf_counter())):
+                handle.cancel()
+                break
+            model = handle.model()
+            if model is None:
+                break
+            sampled += 1
+            for atom in candidates:
+                if model.contains(clingo.parse_term(atom)):
+                    true_counts[atom] += 1
+    solver_stats.record("Shard sampling", ctl)
+    if sampled == 0:
+        return candidates[:shards]
+    balance = sorted(candidates, key=lambda atom: abs(true_counts[atom] / sampled - 0.5))
+    return balance[:shards]
+
+
+def cube_worker(task):
+    global solver_parallel
+    projected_file, show_atoms, limit_type, limit_value, cube, solver_parallel, deadline = task
+    solver_stats.reset()
+    if deadline is not None:
+        # one deadline for all cubes, a cube started late only gets what is left
+        limit_value = deadline - time.time()
+        if limit_value <= 0:
+            return [], solver_stats.snapshot()
+    # clingo symbols do not pickle, ship strings back
+    cells = [([str(atom) for atom in answer_set], filtered_in_atoms, filtered_ex_atoms)
+             for answer_set, filtered_in_atoms, filtered_ex_atoms in
+             enumerate_projected_cells(projected_file, show_atoms, limit_type, limit_value, cube)]
+    return cells, solver_stats.snapshot()
+
+
+def enumerate_sharded_cells(projected_file, show_atoms, limit_type, limit_value, shards, jobs):
+    """enumerate_projected_cells split into 2^shards cubes solved on a process pool.
+
+    Each cube fixes the truth values of the split atoms, so the cubes
+    partition the projected answer sets and every one is yielded exactly
+    once, grouped by cube.
+    """
+    split_atoms = choose_split_atoms(projected_file, show_atoms, shards)
+    cubes = [list(zip(split_atoms, values))
+             for values in itertools.product((True, False), repeat=len(split_atoms))]
+    print(f"\nSplitting enumeration on {split_atoms} into {len(cubes)} cubes")
+    deadline = time.time() + limit_value if limit_type == 2 else None
+    tasks = [(projected_file, show_atoms, limit_type, limit_value, cube, solver_parallel, deadline)
+             for cube in cubes]
+    ans_count = 0
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        for cells, cube_stats in pool.map(cube_worker, tasks):
+            solver_stats.merge(cube_stats)
+            for cell in cells:
+                if limit_type == 1 and ans_count >= limit_value:
+                    return
+                ans_count += 1
+                yield cell
+        # cubes running at the deadline stop there, later ones return at once
+        if deadline is not None and time.time() >= deadline:
+            print(f"\n⏰ Time limit of {limit_value} seconds reached")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def produce_cells(cell_queue, projected_file, show_atoms, limit_type, limit_value, parent_path=()):
+    """Pipeline producer: push projected models into the bounded queue, None when done."""
+    # Report "**Clingo time" where the sequential run has it, not as a root span of this thread
+    span_profiler.adopt(parent_path)
+    start_profile("**Clingo time")
+    ans_count = 0
+    try:
+        for cell in enumerate_projected_cells(projected_file, show_atoms, limit_type, limit_value):
+            # put() blocks while the queue is full, holding back the solver
+            cell_queue.put(cell)
+            ans_count += 1
+            progress.count_model()
+    finally:
+        record_profile("**Clingo time")
+        progress.set_total(ans_count)
+        cell_queue.put(None)
+
+
+def pipeline_facet_processing(projected_file, show_atoms, limit_type, limit_value, engine, jobs, queue_size,
+                              parent_path=()):
+    """Overlap enumeration and facet computation through a bounded queue.
+
+    clingo enumerates on a producer thread while facets are computed in this
+    thread (jobs == 1) or on a process pool. Yields (answer_set,
+    filtered_in_atoms, filtered_ex_atoms, facet_list) in enumeration order as
+    soon as each cell is done. The producer's spans are nested under parent_path.
+    """
+    cell_queue = queue.Queue(maxsize=queue_size)
+    progress.watch_queue(cell_queue)
+    producer = threading.Thread(target=produce_cells,
+                                args=(cell_queue, projected_file, show_atoms, limit_type, limit_value,
+                                      parent_path),
+                                daemon=True)
+    producer.start()
+    if jobs == 1:
+        cell_facets = facet_function(engine)
+        while True:
+            cell = cell_queue.get()
+            if cell is None:
+                break
+            answer_set, filtered_in_atoms, filtered_ex_atoms = cell
+            yield cell + (cell_facets(filtered_ex_atoms, filtered_in_atoms, [], [], projected_file),)
+    else:
+        scratch_dir = tempfile.mkdtemp(prefix="facets_")
+        pending = deque()
+        try:
+            # Workers start on the first submit, after the producer is inside ctl.solve();
+            # forking then could copy a lock held by that thread, forkserver does not fork us
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     mp_context=multiprocessing.get_context("forkserver"),
+                                     initializer=init_facet_worker,
+                                     initargs=(scratch_dir, *cache_settings(), slow_cells.settings(),
+                                               solver_stats.per_query)) as pool:
+                while True:
+                    cell = cell_queue.get()
+                    if cell is not None:
+                        answer_set, filtered_in_atoms, filtered_ex_atoms = cell
+                        task = (engine, filtered_ex_atoms, filtered_in_atoms, projected_file)
+                        pending.append((cell, pool.submit(facet_worker, task)))
+                    # Bound the cells in flight, emit finished ones in order
+                    while pending and (cell is None or len(pending) >= 2 * jobs or pending[0][1].done()):
+                        done_cell, future = pending.popleft()
+                        facet_list, worker_profile = future.result()
+                        merge_worker_profile(worker_profile)
+                        yield done_cell + (facet_list,)
+                    if cell is None:
+                        break
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    producer.join()
+
+
+def main(projected_file, limit_type=None, limit_value=None, engine="fasb", jobs=1,
+         pipeline=False, queue_size=64, spill_dir=None, prefetch=0, shards=0, threads=1,
+         parallel_mode="compete", jsonl_path=None, quiet=False, navigation=None):   
+    """Enumerate, report and optionally navigate; returns the number of projected answer sets.
+
+    navigation None asks on stdin whether to navigate afterwards.
+    """
+    global facet_engine, prefetch_jobs, solver_parallel
+    facet_engine = engine
+    prefetch_jobs = prefetch
+    solver_parallel = f"{threads},{parallel_mode}" if threads > 1 else None
+    navigation_flag = bool(navigation)
+    if navigation is None:
+        start_profile("User input")
+        nav_input = input("Do you want to enable navigation mode? (y/n): ").strip().lower()
+        if nav_input == 'y':
+            navigation_flag = True
+        record_profile("User input")            
+
+    with open(projected_file, 'r') as f:
+        content = f.readlines()
+            
+    #--- Extract show atoms
+    show_atoms = extract_show_atoms(content)
+    if not show_atoms:
+        print("Error: No projection in input ASP. Program bypassed.")
+        return 0
+    else:
+        print(f"\nProjected atoms extracted: {show_atoms}")
+
+    if spill_dir:
+        ans_store = DiskAnswerSetStore(spill_dir, show_atoms)
     else:
-        print(f"\nTotal answer sets found: {len(all_ans_sets)}")
-        #for all_ans_index in enumerate(all_ans_sets)
+        ans_store = AnswerSetStore()
+    sinks = open_sinks(jsonl_path, quiet)
+    for sink in sinks:
+        sink.start(projected_file, show_atoms)
+    ans_count = 0
+    try:
+        ans_count = run_facet_stage(ans_store, projected_file, show_atoms, limit_type, limit_value,
+                                    engine, jobs, pipeline, queue_size, navigation_flag, shards, sinks)
+    finally:
+        for sink in sinks:
+            sink.close(ans_count)
+        ans_store.close()
+        record_facet_totals()
+    return ans_count
+
+
+def record_facet_totals():
+    """Solver statistics of the in-process facet queries, read once per grounded program."""
+    if solver_stats.per_query:
+        return
+    for ctl in facet_controls.values():
+        solver_stats.record_totals("Facet query", ctl)
+
+
+def report_slow_cells():
+    logged = slow_cells.finish()
+    if logged:
+        print(f"\n🐢 {logged} slow cells logged with reproduction bundles in {slow_cells.log_dir}")
+
+
+def run_facet_stage(ans_store, projected_file, show_atoms, limit_type, limit_value,
+                    engine, jobs, pipeline, queue_size, navigation_flag, shards=0, sinks=()):
+    """Enumerate projected answer sets into ans_store, report their facets to sinks.
+
+    Returns the number of projected answer sets.
+    """
+    global last_cell_seconds
+    last_cell_seconds = None
+    cell_facets = facet_function(engine)
+    nv_in_atoms=[]
+    nv_ex_atoms=[]
+    if pipeline:
         print("\nFacet Count Processing:")
+        # enumeration runs beside the facet stage, not inside it
+        parent_path = span_profiler.current_path()
         start_profile("Facet count time")
-        for ans_idx, ans_sets in enumerate(all_ans_sets):
-            facet_list=facet_processing(all_filtered_ex_atoms[ans_idx],
-                                        all_filtered_in_atoms[ans_idx],
-                                        nv_ex_atoms,
-                                        nv_in_atoms,
-                                        projected_file)
-            print(f"\n✅ Answer Set {ans_idx + 1}: {ans_sets}")        
-            print("Included Projected Atoms: ", all_filtered_in_atoms[ans_idx])
-            print("Excluded Projected Atoms: ", all_filtered_ex_atoms[ans_idx])
-            print("Facet Count: ",len(facet_list))
-            #print_facets(facet_list)
+        ans_count = 0
+        for answer_set, filtered_in_atoms, filtered_ex_atoms, facet_list in pipeline_facet_processing(
+                projected_file, show_atoms, limit_type, limit_value, engine, jobs, queue_size, parent_path):
+            ans_count += 1
+            progress.count_cell()
+            for sink in sinks:
+                sink.cell(ans_count, answer_set, filtered_in_atoms, filtered_ex_atoms, facet_list,
+                          last_cell_seconds)
+            if navigation_flag:
+                ans_store.set_facets(ans_store.append(answer_set, filtered_in_atoms, filtered_ex_atoms),
+                                     facet_list)
+        record_profile("Facet count time")
+        close_fasb_sessions()
+        report_slow_cells()
+        if ans_count == 0:
+            print("No answer sets found with the specified projected atoms.")
+            return 0
+        print(f"\nTotal answer sets found: {ans_count}")
+    else:
+        # Solve and process answer sets
+        start_profile("**Clingo time")
+        if shards > 0:
+            cell_stream = enumerate_sharded_cells(projected_file, show_atoms, limit_type, limit_value,
+                                                  shards, jobs)
+        else:
+            cell_stream = enumerate_projected_cells(projected_file, show_atoms, limit_type, limit_value)
+        for answer_set, filtered_in_atoms, filtered_ex_atoms in cell_stream:
+            ans_store.append(answer_set, filtered_in_atoms, filtered_ex_atoms)
+            progress.count_model()
+        record_profile("**Clingo time")
+        progress.set_total(len(ans_store))
+        if len(ans_store) == 0:
+            print("No answer sets found with the specified projected atoms.")
+            return 0
+        print(f"\nTotal answer sets found: {len(ans_store)}")
+        print("\nFacet Count Processing:")
+        start_profile("Facet count time")
+        # Read back lazily, ans_store may live on disk
+        cells = ((ans_store.ex_atoms(ans_idx), ans_store.in_atoms(ans_idx))
+                 for ans_idx in range(len(ans_store)))
+        if engine == "single-pass":
+            start_profile("**Single-pass facet enumeration")
+            cell_facet_map = facets_by_projection(projected_file, show_atoms)
+            record_profile("**Single-pass facet enumeration")
+            all_facet_lists = (cell_facet_map.get(frozenset(in_atoms), []) for ex_atoms, in_atoms in cells)
+        elif jobs > 1:
+            all_facet_lists = parallel_facet_processing(cells, engine, projected_file, jobs)
+        else:
+            all_facet_lists = (cell_facets(ex_atoms, in_atoms, nv_ex_atoms, nv_in_atoms, projected_file)
+                               for ex_atoms, in_atoms in cells)
+        for ans_idx, facet_list in enumerate(all_facet_lists):
+            progress.count_cell()
+            if sinks:
+                answer_set = ans_store.answer_set(ans_idx)
+                in_atoms = ans_store.in_atoms(ans_idx)
+                ex_atoms = ans_store.ex_atoms(ans_idx)
+                for sink in sinks:
+                    sink.cell(ans_idx + 1, answer_set, in_atoms, ex_atoms, facet_list, last_cell_seconds)
             if navigation_flag:            
-                all_ans_facets.append(facet_list)
+                ans_store.set_facets(ans_idx, facet_list)
         record_profile("Facet count time")
+        close_fasb_sessions()
+        report_slow_cells()
     # Start navigation if enabled
     if navigation_flag:
+        # the menu is interactive, stop reporting progress
+        progress.stop()
         print("\n Navigation Mode Activated")
-        answer_set_navigation(all_ans_sets,
-                              all_ans_facets,
-                              all_filtered_in_atoms,
-                              all_filtered_ex_atoms,
-                              projected_file
-                              )
+        answer_set_navigation(ans_store, projected_file)
+    return len(ans_store) if not pipeline else ans_count
                               
   
 
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python script.py as_r_file.lp")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python script.py as_r_file.lp [--engine fasb|fasb-session|clingo|single-pass|matrix] [--jobs N] [--pipeline] [--cache-dir DIR] [--spill-dir DIR] [--prefetch N] [--shards K] [--threads N] [--parallel-mode compete|split] [--jsonl FILE] [--quiet] [--trace FILE] [--slow-log DIR] [--progress [S]] [--status-file FILE]")
+    parser.add_argument("projected_file")
+    parser.add_argument("--engine", choices=["fasb", "fasb-session", "clingo", "single-pass", "matrix"],
+                        default="fasb",
+                        help="facet computation: fasb per cell, one fasb session, in-process clingo per cell, "
+                             "one clingo pass over all answer sets, or bit matrix queries (needs numpy)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for facet computation across answer sets and for --shards")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="compute facets while clingo is still enumerating")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="bound on enumerated cells waiting for facet computation (--pipeline)")
+    parser.add_argument("--cache-dir",
+                        help="directory of the persistent facet cache, disabled when omitted")
+    parser.add_argument("--cache-size", type=int, default=100000,
+                        help="maximum cached facet results before LRU eviction")
+    parser.add_argument("--spill-dir",
+                        help="keep enumerated answer sets in memory-mapped files under this directory")
+    parser.add_argument("--prefetch", type=int, default=0,
+                        help="background workers computing next facet activations during navigation")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="split enumeration on K projected atoms into 2^K cubes solved on --jobs processes")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="clingo solver threads for enumeration, cells are sorted by projected assignment "
+                             "and reported with a single-threaded witness model")
+    parser.add_argument("--parallel-mode", choices=["compete", "split"], default="compete",
+                        help="clingo parallel mode for --threads")
+    parser.add_argument("--jsonl",
+                        help="write one JSON record per projected answer set to this file")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not print the per answer set report")
+    parser.add_argument("--trace",
+                        help="write the profiled spans as Chrome trace / Perfetto JSON to this file")
+    parser.add_argument("--slow-log",
+                        help="write a .lp + .fsb reproduction bundle of every slow cell to this directory")
+    parser.add_argument("--slow-threshold", type=float,
+                        help="cells whose facet computation takes at least this many seconds are slow")
+    parser.add_argument("--slow-top", type=float,
+                        help="the slowest fraction of cells is slow, e.g. 0.01 (default when no threshold is given)")
+    parser.add_argument("--progress", type=float, nargs="?", const=1.0,
+                        help="report throughput and ETA to stderr every S seconds (default 1)")
+    parser.add_argument("--status-file",
+                        help="write the progress report as JSON to this file instead of stderr")
+    parser.add_argument("--solver-stats", action="store_true",
+                        help="read clingo statistics after every facet query, also in --jobs workers "
+                             "(slower, by default they are read once per grounded program)")
+    parser.add_argument("--metrics-file",
+                        help="write counters and latency histograms in OpenMetrics text format to this file, "
+                             "e.g. a node_exporter textfile collector .prom path")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between --metrics-file updates (default 15)")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be a positive integer")
+    if args.prefetch < 0:
+        parser.error("--prefetch must not be negative")
+    if args.threads < 1:
+        parser.error("--threads must be a positive integer")
+    if args.shards < 0:
+        parser.error("--shards must not be negative")
+    if args.shards and args.pipeline:
+        parser.error("--shards enumerates in worker processes, --pipeline does not apply")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be a positive integer")
+    if args.engine == "single-pass" and (args.pipeline or args.jobs > 1):
+        parser.error("--engine single-pass computes all cells in one solver call, "
+                     "--pipeline and --jobs do not apply")
+    if args.engine == "matrix" and args.jobs > 1:
+        parser.error("--engine matrix answers cells from one in-memory matrix, --jobs does not apply")
+    if args.cache_dir:
+        facet_cache.configure(args.cache_dir, args.cache_size)
+    solver_stats.per_query = args.solver_stats
+    if args.trace:
+        span_profiler.enable_trace()
+    if args.slow_log:
+        if args.slow_top is not None and not 0 < args.slow_top <= 1:
+            parser.error("--slow-top must be a fraction in (0, 1]")
+        slow_top = args.slow_top
+        if slow_top is None and args.slow_threshold is None:
+            slow_top = 0.01
+        slow_cells.configure(args.slow_log, args.slow_threshold, slow_top)
+    elif args.slow_threshold is not None or args.slow_top is not None:
+        parser.error("--slow-threshold and --slow-top need --slow-log")
+    if args.progress is not None and args.progress <= 0:
+        parser.error("--progress interval must be positive")
+    if args.metrics_interval <= 0:
+        parser.error("--metrics-interval must be positive")
     # Record program start time
     start_profile("Entire program") 
     # Get user preferences
     limit_type, limit_value = get_user_limits()
+    if args.progress is not None or args.status_file:
+        progress.start(args.progress or 1.0, args.status_file)
+    if args.metrics_file:
+        metrics_export.start(args.metrics_file, profile_data, args.metrics_interval, args.projected_file)
     # Run the main program with the specified limits
-    main(sys.argv[1], limit_type, limit_value)
+    main(args.projected_file, limit_type, limit_value, args.engine, args.jobs,
+         args.pipeline, args.queue_size, args.spill_dir, args.prefetch, args.shards,
+         args.threads, args.parallel_mode, args.jsonl, args.quiet)
+    progress.stop()
+    facet_cache.close()
     # Print detailed profile
     record_profile("Entire program")
-    print_profile()
\ No newline at end of file
+    metrics_export.stop()
+    print_profile()
+    if args.trace:
+        span_profiler.export_chrome_trace(args.trace)
\ No newline at end of file
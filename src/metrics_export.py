@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+
+import facet_cache
+import progress
+import span_profiler
+import child_usage
+
+# Written in OpenMetrics text format to path every interval seconds, path None disables it
+path = None
+interval = 15.0
+labels = {}
+# Flat profile of the run, stage -> seconds
+profile = {}
+writer = None
+stopped = threading.Event()
+
+# Profile keys exported as per-call latency histograms
+LATENCY_STAGES = ("**FASB execution", "Create modified program", "Facet cell",
+                  "**Clingo facet execution", "**Matrix facet execution")
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def start(metrics_path, profile_data, seconds=15.0, instance=None):
+    """Write metrics to metrics_path now and every seconds until stop()."""
+    global path, interval, labels, profile, writer
+    path = metrics_path
+    profile = profile_data
+    interval = seconds
+    labels = {"instance": os.path.basename(instance)} if instance else {}
+    stopped.clear()
+    writer = threading.Thread(target=write_loop, daemon=True)
+    writer.start()
+
+
+def stop():
+    """Stop the writer thread after writing the final values."""
+    global writer
+    if writer is None:
+        return
+    stopped.set()
+    writer.join()
+    writer = None
+
+
+def write_loop():
+    write()
+    while not stopped.wait(interval):
+        write()
+    write()
+
+
+def write():
+    write_file(path, render())
+
+
+def write_file(target, text):
+    # The collector must never read a half-written file, and it skips names not ending in .prom
+    temp = target + ".tmp"
+    with open(temp, 'w') as f:
+        f.write(text)
+    os.replace(temp, target)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_text(extra=None):
+    merged = dict(labels, **(extra or {}))
+    if not merged:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in merged.items()) + "}"
+
+
+def counter(lines, name, help_text, samples):
+    """samples is a list of (extra labels, value)."""
+    lines.append(f"# TYPE epasufr_{name} counter")
+    lines.append(f"# HELP epasufr_{name} {help_text}")
+    for extra, value in samples:
+        lines.append(f"epasufr_{name}_total{label_text(extra)} {value}")
+
+
+def stage_durations(stage):
+    """Per-call durations in seconds of every span named stage, whatever it is nested in."""
+    durations = []
+    for span_path, entry in list(span_profiler.spans.items()):
+        if span_path[-1] == stage:
+            # tolist() copies in one step while the profiled threads keep appending
+            durations.extend(entry[0].tolist())
+    return [duration / 1e9 for duration in durations]
+
+
+def histogram(lines, stage):
+    durations = stage_durations(stage)
+    if not durations:
+        return
+    durations.sort()
+    extra = {"stage": stage}
+    position = 0
+    for bound in BUCKETS:
+        while position < len(durations) and durations[position] <= bound:
+            position += 1
+        lines.append(f"epasufr_call_latency_seconds_bucket{label_text(dict(extra, le=bound))} {position}")
+    lines.append(f"epasufr_call_latency_seconds_bucket{label_text(dict(extra, le='+Inf'))} {len(durations)}")
+    lines.append(f"epasufr_call_latency_seconds_sum{label_text(extra)} {sum(durations)}")
+    lines.append(f"epasufr_call_latency_seconds_count{label_text(extra)} {len(durations)}")
+
+
+def render():
+    lines = []
+    counter(lines, "answer_sets", "Projected answer sets enumerated.", [(None, progress.models)])
+    counter(lines, "facet_cells", "Cells whose facets were computed.", [(None, progress.cells)])
+    counter(lines, "facet_cache_hits", "Facet cache hits.", [(None, facet_cache.cache_hits)])
+    counter(lines, "facet_cache_misses", "Facet cache misses.", [(None, facet_cache.cache_misses)])
+    counter(lines, "child_processes", "fasb processes started.",
+            [({"stage": stage}, entry[0]) for stage, entry in list(child_usage.usage.items())])
+    counter(lines, "stage_seconds", "Wall time per profile key.",
+            [({"stage": stage}, seconds) for stage, seconds in list(profile.items())])
+    lines.append("# TYPE epasufr_call_latency_seconds histogram")
+    lines.append("# HELP epasufr_call_latency_seconds Per-call latency of profiled stages.")
+    for stage in LATENCY_STAGES:
+        histogram(lines, stage)
+    lines.append("# TYPE epasufr_last_update_seconds gauge")
+    lines.append(f"epasufr_last_update_seconds{label_text()} {time.time()}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_batch(target, statuses, remaining):
+    """Batch-level metrics: finished instances per status and instances still to run."""
+    lines = ["# TYPE epasufr_batch_instances counter",
+             "# HELP epasufr_batch_instances Finished instances per status."]
+    for status, count in sorted(statuses.items()):
+        lines.append(f'epasufr_batch_instances_total{{status="{escape(status)}"}} {count}')
+    lines.append("# TYPE epasufr_batch_remaining gauge")
+    lines.append(f"epasufr_batch_remaining {remaining}")
+    lines.append("# TYPE epasufr_last_update_seconds gauge")
+    lines.append(f'epasufr_last_update_seconds{{instance="batch"}} {time.time()}')
+    lines.append("# EOF")
+    write_file(target, "\n".join(lines) + "\n")
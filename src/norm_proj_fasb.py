@@ -4,70 +4,161 @@ import re
 import subprocess
 import os
 import time
+import select
 from datetime import datetime
 from collections import defaultdict
-import subprocess
-import selectors
+
+import child_usage
 
 
 def get_inst_fasb(modified_file):
     fasb_command = ["fasb", modified_file, "0"]
     try:
-        proc = subprocess.Popen(
+        proc = child_usage.spawn(
+            "fasb session",
             fasb_command,
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            # never drained, a full stderr pipe would block fasb
+            stderr=subprocess.DEVNULL,
             text=True,
             bufsize=1
         )
+        if learn_sentinel(proc) is None:
+            print("FASB did not answer ':mode' after starting.")
+            close_fasb(proc)
+            return None
         return proc    
     except Exception as e:
         print(f"Exception during FASB interaction: {e}")
         return None
 
 
+# fasb has no echo command, the ':mode' reply serves as end-of-response marker
+SENTINEL_CMD = ":mode\n"
+ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
+# Seconds without any output before a reply is given up, only a fallback for a lost sentinel
+REPLY_TIMEOUT = 120
+# Silence that ends a reply of unknown length, only waited for when the ':mode' reply is learnt
+QUIET_SECONDS = 0.5
+# Bytes read from a session's stdout but not yet returned as lines, per pid
+pending_output = {}
+# The ':mode' reply of each session, per pid. It names the current mode, so it is
+# learnt again after every mode command.
+sentinels = {}
+
+
+def plain_line(line):
+    return ansi_escape.sub('', line).strip()
+
+
+def is_sentinel(proc, line):
+    return plain_line(line) == sentinels.get(proc.pid)
+
+
+def read_until_quiet(proc, first_timeout):
+    """Lines up to QUIET_SECONDS of silence, None if nothing came within first_timeout."""
+    lines = []
+    timeout = first_timeout
+    while True:
+        line = read_line(proc, timeout)
+        if not line:
+            return lines if lines else None
+        lines.append(line)
+        timeout = QUIET_SECONDS
+
+
+def learn_sentinel(proc):
+    """Send ':mode' and remember its reply as the marker, return the lines that came before it."""
+    proc.stdin.write(SENTINEL_CMD)
+    proc.stdin.flush()
+    lines = read_until_quiet(proc, REPLY_TIMEOUT)
+    plain = [plain_line(line) for line in lines or []]
+    if not any(plain):
+        return None
+    last = max(index for index, text in enumerate(plain) if text)
+    sentinels[proc.pid] = plain[last]
+    return [line.strip() for line in lines[:last]]
+
+
 def send_input_fasb(user_input,proc):
     output=call_fasb_with_input(user_input,proc)    
     print("\n".join(output))    
 
-    #Dummy call added to flush out pending output line
-    mode_cmd=":mode\n"
-    output=call_fasb_with_input(mode_cmd,proc)
-    for line in output:
-        if ("goal oriented" in line or "strictly" in line):
-            pass
-        else:
-            print(line)    
+
+def read_line(proc, timeout):
+    """Next stdout line of a fasb session, '' at EOF, None after timeout seconds without output."""
+    # select() cannot see lines already buffered by proc.stdout, so read the pipe directly
+    buffer = pending_output.get(proc.pid, b"")
+    while b"\n" not in buffer:
+        ready, _, _ = select.select([proc.stdout], [], [], timeout)
+        if not ready:
+            pending_output[proc.pid] = buffer
+            return None
+        chunk = os.read(proc.stdout.fileno(), 65536)
+        if not chunk:
+            pending_output.pop(proc.pid, None)
+            return buffer.decode()
+        buffer += chunk
+    line, _, pending_output[proc.pid] = buffer.partition(b"\n")
+    return line.decode() + "\n"
+
 
 def call_fasb_with_input(user_input,proc):    
+    """Send one command and read its reply up to the sentinel.
+
+    A session that stays silent for REPLY_TIMEOUT seconds is killed, its
+    replies could no longer be matched to commands.
+    """
     output=[]
     try:      
-        sel = selectors.DefaultSelector()
-        sel.register(proc.stdout, selectors.EVENT_READ)
-        #print(f"Sending to fasb: {user_input.strip()}")
-        proc.stdin.write(user_input)
+        if user_input.startswith(("'", ":mode")):
+            # the mode changes, and with it the ':mode' reply
+            proc.stdin.write(user_input)
+            output = learn_sentinel(proc)
+            if output is None:
+                print(f"FASB gave no reply to {user_input.strip()!r} within {REPLY_TIMEOUT}s, closing the session.")
+                proc.kill()
+                close_fasb(proc)
+                return []
+            return output
+        proc.stdin.write(user_input + SENTINEL_CMD)
         proc.stdin.flush()
-        # Read available output without blocking
-        #sleep a bit to allow fasb to respond  
-        timeout = 5 if user_input.startswith(("!")) else 2      
-        while True:                        
-            events = sel.select(timeout=timeout)                   
-            if not events:
-                #print(f"Waiting time {timeout} and Breaking.")
+        while True:
+            line = read_line(proc, REPLY_TIMEOUT)
+            if line is None:
+                print(f"FASB gave no reply to {user_input.strip()!r} within {REPLY_TIMEOUT}s, closing the session.")
+                proc.kill()
+                close_fasb(proc)
                 break
-            for key, _ in events:
-                line = key.fileobj.readline()
-                if line:
-                    output.append(line.strip())
+            if not line:
+                print("FASB session closed unexpectedly.")
+                break
+            if is_sentinel(proc, line):
+                break
+            output.append(line.strip())
     except Exception as e:
         print(f"Exception during FASB interaction: {e}")
     return output        
 
+
+def clean_fasb_lines(output):
+    """Drop empty lines and '::' status lines, remove ANSI codes."""
+    lines = [ansi_escape.sub('', line).strip() for line in output]
+    return [line for line in lines if line and not line.startswith("::")]
+
         
 def close_fasb(proc):
+    # a REPL is only reaped here, read its CPU time and peak RSS while it is alive
+    child_usage.sample_process("fasb session", proc.pid)
+    pending_output.pop(proc.pid, None)
+    sentinels.pop(proc.pid, None)
     try:
         proc.stdin.close()
+    except BrokenPipeError:
+        # a killed session cannot take the buffered input any more
+        pass
+    try:
         proc.wait()
     except Exception as e:
         print(f"Exception during closing FASB: {e}")        
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import threading
+
+# Counters bumped from the hot loops, read by the reporter thread
+models = 0
+cells = 0
+# Number of cells once enumeration is done, None while unknown
+total_cells = None
+# Pipeline queue whose depth is reported, None outside --pipeline
+cell_queue = None
+# When the first cell was counted, the ETA is based on the rate since then
+first_cell_time = None
+
+interval = None
+status_file = None
+started = None
+reporter = None
+stopped = threading.Event()
+
+
+def count_model():
+    global models
+    models += 1
+
+
+def count_cell():
+    global cells, first_cell_time
+    if first_cell_time is None:
+        first_cell_time = time.time()
+    cells += 1
+
+
+def set_total(count):
+    global total_cells
+    total_cells = count
+
+
+def watch_queue(watched):
+    global cell_queue
+    cell_queue = watched
+
+
+def start(seconds=1.0, path=None):
+    """Report progress every seconds to stderr, or to the status file path when given."""
+    global interval, status_file, started, reporter
+    interval = seconds
+    status_file = path
+    started = time.time()
+    stopped.clear()
+    reporter = threading.Thread(target=report_loop, daemon=True)
+    reporter.start()
+
+
+def stop():
+    """Stop the reporter after one final report."""
+    global reporter
+    if reporter is None:
+        return
+    stopped.set()
+    reporter.join()
+    reporter = None
+
+
+def report_loop():
+    last = (time.time(), models, cells)
+    while not stopped.wait(interval):
+        last = report(last)
+    report(last, final=True)
+
+
+def report(last, final=False):
+    now = time.time()
+    last_time, last_models, last_cells = last
+    span = max(now - last_time, 1e-9)
+    elapsed = now - started
+    status = {"elapsed": round(elapsed, 1),
+              "models": models,
+              "models_per_second": round((models - last_models) / span, 1),
+              "cells": cells,
+              "cells_per_second": round((cells - last_cells) / span, 1),
+              "total_cells": total_cells,
+              "queue_depth": cell_queue.qsize() if cell_queue is not None else None,
+              "eta": None,
+              "done": final}
+    if total_cells and cells:
+        # average rate over the facet stage so far, steadier than the last interval
+        status["eta"] = round((total_cells - cells) * (now - first_cell_time) / cells, 1)
+    write_status(status)
+    return now, models, cells
+
+
+def write_status(status):
+    if status_file is not None:
+        temp = status_file + ".tmp"
+        with open(temp, 'w') as f:
+            json.dump(status, f)
+        os.replace(temp, status_file)
+        return
+    line = (f"[{status['elapsed']:8.1f}s] models {status['models']} ({status['models_per_second']}/s)"
+            f"  cells {status['cells']}{'/' + str(total_cells) if total_cells is not None else ''}"
+            f" ({status['cells_per_second']}/s)")
+    if status["queue_depth"] is not None:
+        line += f"  queue {status['queue_depth']}"
+    if status["eta"] is not None:
+        line += f"  ETA {status['eta']:.0f}s"
+    print(line, file=sys.stderr, flush=True)
@@ -0,0 +1,82 @@
+import json
+
+from answer_store import AtomTable
+
+# Bytes buffered before a JSONL write reaches the file
+WRITE_BUFFER = 1 << 20
+
+
+class TextSink:
+    """Human-readable renderer, the classic per-cell printout."""
+
+    def start(self, projected_file, show_atoms):
+        pass
+
+    def cell(self, ans_idx, answer_set, filtered_in_atoms, filtered_ex_atoms, facet_list, facet_seconds):
+        print(f"\n✅ Answer Set {ans_idx}: [{', '.join(map(str, answer_set))}]")
+        print("Included Projected Atoms: ", filtered_in_atoms)
+        print("Excluded Projected Atoms: ", filtered_ex_atoms)
+        print("Facet Count: ", len(facet_list))
+
+    def close(self, ans_count):
+        pass
+
+
+class JsonlSink:
+    """One JSON record per line, buffered.
+
+    Atoms are interned: the first time an atom occurs a record
+    {"atom": id, "name": "..."} precedes the record using it, cells then
+    refer to atoms by id:
+    {"cell": n, "atoms": [...], "in": [...], "ex": [...], "facet_count": k,
+     "facets": [...], "facet_seconds": t}
+    where t is the cell's "Facet cell" time, null under --engine single-pass.
+    The stream starts with a {"program": ..., "show_atoms": [...]} record and
+    ends with {"total": #cells}.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w', buffering=WRITE_BUFFER)
+        self.table = AtomTable()
+
+    def write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')))
+        self.file.write('\n')
+
+    def ids(self, atoms):
+        atom_ids = []
+        for atom in atoms:
+            atom = str(atom)
+            known = len(self.table.atoms)
+            atom_id = self.table.intern(atom)
+            if atom_id == known:
+                self.write({"atom": atom_id, "name": atom})
+            atom_ids.append(atom_id)
+        return atom_ids
+
+    def start(self, projected_file, show_atoms):
+        show_ids = self.ids(show_atoms)
+        self.write({"program": projected_file, "show_atoms": show_ids})
+
+    def cell(self, ans_idx, answer_set, filtered_in_atoms, filtered_ex_atoms, facet_list, facet_seconds):
+        self.write({"cell": ans_idx,
+                    "atoms": self.ids(answer_set),
+                    "in": self.ids(filtered_in_atoms),
+                    "ex": self.ids(filtered_ex_atoms),
+                    "facet_count": len(facet_list),
+                    "facets": self.ids(facet_list),
+                    "facet_seconds": round(facet_seconds, 6) if facet_seconds is not None else None})
+
+    def close(self, ans_count):
+        self.write({"total": ans_count})
+        self.file.close()
+
+
+def open_sinks(jsonl_path=None, quiet=False):
+    """Sinks selected on the command line, empty when nothing is reported per cell."""
+    sinks = []
+    if not quiet:
+        sinks.append(TextSink())
+    if jsonl_path:
+        sinks.append(JsonlSink(jsonl_path))
+    return sinks
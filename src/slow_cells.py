@@ -0,0 +1,120 @@
+import os
+import json
+import math
+import heapq
+import hashlib
+
+from clingo_facets import strip_projection
+
+# Slow-cell log settings, log_dir None disables it
+log_dir = None
+threshold = None
+top_fraction = None
+# Facet computations observed and the slowest of them, (seconds, key, record) min-heap
+cells_seen = 0
+slowest = []
+# Bundles already written, a cell can be both over the threshold and in the top
+written = set()
+
+FSB_SCRIPT = "#?\n?\n"
+
+
+def configure(directory, seconds=None, fraction=None):
+    """Log cells slower than seconds, and the slowest fraction of all cells, to directory."""
+    global log_dir, threshold, top_fraction
+    os.makedirs(directory, exist_ok=True)
+    log_dir = directory
+    threshold = seconds
+    top_fraction = fraction
+
+
+def settings():
+    """(log_dir, threshold, top_fraction) to configure pool workers, None when disabled."""
+    if log_dir is None:
+        return None
+    return log_dir, threshold, top_fraction
+
+
+def cell_record(projected_file, in_atoms, ex_atoms, route_in, seconds, facet_count, engine):
+    key = hashlib.sha1(json.dumps([projected_file, sorted(in_atoms), sorted(ex_atoms),
+                                   sorted(route_in)]).encode()).hexdigest()[:12]
+    return key, {"instance": projected_file, "included": list(in_atoms), "excluded": list(ex_atoms),
+                 "route_in": list(route_in), "facet_seconds": round(seconds, 6),
+                 "facet_count": facet_count, "engine": engine}
+
+
+def observe(projected_file, in_atoms, ex_atoms, route_in, seconds, facet_count, engine):
+    """Check one cell's facet computation time against the threshold and the top fraction."""
+    global cells_seen
+    if log_dir is None:
+        return
+    cells_seen += 1
+    if threshold is not None and seconds >= threshold:
+        key, record = cell_record(projected_file, in_atoms, ex_atoms, route_in, seconds, facet_count, engine)
+        write_bundle(key, record, "threshold")
+    if top_fraction is not None:
+        key, record = cell_record(projected_file, in_atoms, ex_atoms, route_in, seconds, facet_count, engine)
+        heapq.heappush(slowest, (seconds, key, record))
+        trim()
+
+
+def trim():
+    # Approximate: a cell dropped early is not reconsidered when the quota grows
+    keep = math.ceil(top_fraction * cells_seen)
+    while len(slowest) > keep:
+        heapq.heappop(slowest)
+
+
+def write_bundle(key, record, reason):
+    """cell_<key>/ with the constrained program, the fasb script and the cell's record."""
+    if key in written:
+        return
+    written.add(key)
+    bundle = os.path.join(log_dir, f"cell_{key}")
+    os.makedirs(bundle, exist_ok=True)
+    with open(record["instance"], 'r') as f:
+        content = f.readlines()
+    constraints = ([f":- not {atom}." for atom in record["included"]] +
+                   [f":- {atom}." for atom in record["excluded"]] +
+                   [f":- not {atom}." for atom in record["route_in"]])
+    with open(os.path.join(bundle, "cell.lp"), 'w') as f:
+        f.write(strip_projection(content) + '\n' + '\n'.join(constraints) + '\n')
+    with open(os.path.join(bundle, "cell.fsb"), 'w') as f:
+        f.write(FSB_SCRIPT)
+    record = dict(record, reason=reason, bundle=bundle,
+                  reproduce=f"fasb {os.path.join(bundle, 'cell.lp')} 0 {os.path.join(bundle, 'cell.fsb')}")
+    with open(os.path.join(bundle, "cell.json"), 'w') as f:
+        json.dump(record, f, indent=1)
+    with open(os.path.join(log_dir, "slow_cells.jsonl"), 'a') as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def snapshot():
+    return {"cells_seen": cells_seen, "slowest": list(slowest), "written": list(written)}
+
+
+def merge(other):
+    global cells_seen
+    cells_seen += other["cells_seen"]
+    written.update(other["written"])
+    for entry in other["slowest"]:
+        heapq.heappush(slowest, tuple(entry))
+    if top_fraction is not None:
+        trim()
+
+
+def reset():
+    global cells_seen
+    cells_seen = 0
+    slowest.clear()
+    written.clear()
+
+
+def finish():
+    """Write the bundles of the slowest cells, return how many cells were logged in total."""
+    if log_dir is None:
+        return 0
+    for seconds, key, record in sorted(slowest, reverse=True):
+        write_bundle(key, record, "top")
+    slowest.clear()
+    return len(written)
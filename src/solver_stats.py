@@ -0,0 +1,140 @@
+# clingo statistics per stage: sums of solve counters and largest problem sizes
+stats = {}
+# Read the statistics after every facet query instead of once per Control, costly with many cells
+per_query = False
+
+# Totals of each Control (by id) already added by record_new_totals
+recorded_totals = {}
+
+# Summed over the solve calls of a stage, paths in ctl.statistics of the last step
+SOLVE_COUNTERS = {
+    "choices": ("solving", "solvers", "choices"),
+    "conflicts": ("solving", "solvers", "conflicts"),
+    "restarts": ("solving", "solvers", "restarts"),
+    "models": ("summary", "models", "enumerated"),
+    "solve_time": ("summary", "times", "solve"),
+    "cpu_time": ("summary", "times", "cpu"),
+}
+# The same counters accumulated over every solve call of a Control grounded with --stats
+TOTAL_COUNTERS = {
+    "choices": ("accu", "solving", "solvers", "choices"),
+    "conflicts": ("accu", "solving", "solvers", "conflicts"),
+    "restarts": ("accu", "solving", "solvers", "restarts"),
+    "models": ("accu", "models", "enumerated"),
+    "solve_time": ("accu", "times", "solve"),
+    "cpu_time": ("accu", "times", "cpu"),
+}
+# Largest over the solve calls of a stage
+PROBLEM_SIZES = {
+    "atoms": ("problem", "lp", "atoms"),
+    "rules": ("problem", "lp", "rules"),
+    "bodies": ("problem", "lp", "bodies"),
+    "vars": ("problem", "generator", "vars"),
+    "constraints": ("problem", "generator", "constraints"),
+}
+
+
+def stage_stats(stage):
+    entry = stats.get(stage)
+    if entry is None:
+        entry = stats[stage] = dict.fromkeys(["calls", "ground_time", *SOLVE_COUNTERS, *PROBLEM_SIZES], 0)
+    return entry
+
+
+def lookup(statistics, path):
+    value = statistics
+    for key in path:
+        if key not in value:
+            return 0
+        value = value[key]
+    return value
+
+
+def record(stage, ctl):
+    """Add the statistics of the last solve call on ctl to stage."""
+    statistics = ctl.statistics
+    entry = stage_stats(stage)
+    entry["calls"] += 1
+    for name, path in SOLVE_COUNTERS.items():
+        entry[name] += lookup(statistics, path)
+    for name, path in PROBLEM_SIZES.items():
+        entry[name] = max(entry[name], lookup(statistics, path))
+
+
+def totals(ctl):
+    """Calls and TOTAL_COUNTERS of ctl, None if it has no accumulated statistics."""
+    statistics = ctl.statistics
+    if "accu" not in statistics:
+        # never solved, or grounded without --stats
+        return None
+    # summary.call is the index of the last solve call
+    values = {"calls": int(lookup(statistics, ("summary", "call"))) + 1}
+    for name, path in TOTAL_COUNTERS.items():
+        values[name] = lookup(statistics, path)
+    return values
+
+
+def add_totals(stage, ctl, values):
+    entry = stage_stats(stage)
+    for name, value in values.items():
+        entry[name] += value
+    for name, path in PROBLEM_SIZES.items():
+        entry[name] = max(entry[name], lookup(ctl.statistics, path))
+
+
+def record_totals(stage, ctl):
+    """Add the statistics accumulated over all solve calls on ctl to stage."""
+    values = totals(ctl)
+    if values is not None:
+        add_totals(stage, ctl, values)
+
+
+def record_new_totals(stage, ctl):
+    """Like record_totals, but only what ctl accumulated since the last call for it.
+
+    Pool workers keep their Control across tasks and ship stats per task.
+    """
+    values = totals(ctl)
+    if values is None:
+        return
+    previous = recorded_totals.get(id(ctl), {})
+    recorded_totals[id(ctl)] = values
+    change = {name: value - previous.get(name, 0) for name, value in values.items()}
+    if change["calls"]:
+        add_totals(stage, ctl, change)
+
+
+def record_ground(stage, seconds):
+    stage_stats(stage)["ground_time"] += seconds
+
+
+def snapshot():
+    return {stage: dict(entry) for stage, entry in stats.items()}
+
+
+def merge(other):
+    for stage, other_entry in other.items():
+        entry = stage_stats(stage)
+        for name, value in other_entry.items():
+            if name in PROBLEM_SIZES:
+                entry[name] = max(entry[name], value)
+            else:
+                entry[name] += value
+
+
+def reset():
+    stats.clear()
+
+
+def report():
+    """Lines of per-stage solver statistics, for the profile printout."""
+    lines = []
+    for stage, entry in stats.items():
+        lines.append(f"{stage:<40}: calls {entry['calls']:<7} ground {entry['ground_time']:.4f}s  "
+                     f"solve {entry['solve_time']:.4f}s  models {int(entry['models'])}")
+        lines.append(f"{'':<40}  atoms {int(entry['atoms'])}  rules {int(entry['rules'])}  "
+                     f"bodies {int(entry['bodies'])}  vars {int(entry['vars'])}  "
+                     f"constraints {int(entry['constraints'])}")
+        lines.append(f"{'':<40}  choices {int(entry['choices'])}  conflicts {int(entry['conflicts'])}  "
+                     f"restarts {int(entry['restarts'])}")
+    return lines
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import threading
+from array import array
+from contextlib import contextmanager
+
+# path (tuple of span names, outermost first) -> [durations in ns, self time in ns]
+spans = {}
+# Open spans of each thread, [name, start ns, ns spent in child spans, trace args],
+# nested under the path the thread adopted from its parent
+local = threading.local()
+# Chrome trace events, None while tracing is off
+trace_events = None
+
+
+def open_spans():
+    stack = getattr(local, "stack", None)
+    if stack is None:
+        stack = local.stack = []
+    return stack
+
+
+def parent_path():
+    return getattr(local, "parent", ())
+
+
+def adopt(path):
+    """Nest the spans of this thread under path, e.g. the current_path() of the thread that started it."""
+    local.parent = tuple(path)
+
+
+def current_path():
+    return parent_path() + tuple(entry[0] for entry in open_spans())
+
+
+def start(name, **trace_args):
+    """Open a span, nested in the innermost span open on this thread."""
+    open_spans().append([name, time.perf_counter_ns(), 0, trace_args])
+
+
+def stop(name):
+    """Close the innermost open span called name, return its duration in ns, None if it is not open."""
+    end = time.perf_counter_ns()
+    stack = open_spans()
+    for depth in range(len(stack) - 1, -1, -1):
+        if stack[depth][0] == name:
+            break
+    else:
+        return None
+    path = parent_path() + tuple(entry[0] for entry in stack[:depth + 1])
+    _, begin, child_ns, trace_args = stack.pop(depth)
+    elapsed = end - begin
+    if depth > 0:
+        stack[depth - 1][2] += elapsed
+    add(path, [elapsed], elapsed - child_ns)
+    if trace_events is not None:
+        event = {"name": name, "ph": "X", "ts": begin / 1000, "dur": elapsed / 1000,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if trace_args:
+            event["args"] = trace_args
+        trace_events.append(event)
+    return elapsed
+
+
+@contextmanager
+def span(name, **trace_args):
+    start(name, **trace_args)
+    try:
+        yield
+    finally:
+        stop(name)
+
+
+def add(path, durations, self_ns):
+    entry = spans.get(path)
+    if entry is None:
+        entry = spans[path] = [array('q'), 0]
+    entry[0].extend(durations)
+    entry[1] += self_ns
+
+
+def enable_trace():
+    global trace_events
+    if trace_events is None:
+        trace_events = []
+
+
+def reset():
+    """Forget all spans and trace events, e.g. per task in a forked pool worker."""
+    spans.clear()
+    # spans the parent had open at fork time are not ours
+    open_spans().clear()
+    if trace_events is not None:
+        trace_events.clear()
+
+
+def snapshot():
+    """Picklable copy of the finished spans and trace events, for merge()."""
+    return {"spans": {path: (entry[0].tolist(), entry[1]) for path, entry in spans.items()},
+            "trace": list(trace_events) if trace_events is not None else None}
+
+
+def merge(other):
+    """Add a worker snapshot, nested under the spans open on this thread."""
+    prefix = current_path()
+    for path, (durations, self_ns) in other["spans"].items():
+        add(prefix + tuple(path), durations, self_ns)
+    if trace_events is not None and other["trace"]:
+        trace_events.extend(other["trace"])
+
+
+def percentile(sorted_ns, fraction):
+    return sorted_ns[min(len(sorted_ns) - 1, int(fraction * len(sorted_ns)))]
+
+
+def report(total_name="Entire program"):
+    """Lines of the span tree: total, self time, calls and p50/p95/max per call.
+
+    Percentages are of the root span total_name; self times of all spans
+    add up to the total, unlike the totals of nested spans. Spans merged
+    from pool workers are summed across workers and, like spans of threads
+    that adopt()ed a parent, may overlap their siblings and exceed their parent.
+    """
+    total = sum(entry[0][0] for path, entry in spans.items() if path == (total_name,))
+    lines = []
+    for path in sorted(spans, key=tree_order):
+        durations, self_ns = spans[path]
+        calls = sorted(durations)
+        span_total = sum(calls)
+        name = "  " * (len(path) - 1) + path[-1]
+        share = f"{span_total / total * 100:5.1f}%" if total else "    -"
+        lines.append(f"{name:<40}: {span_total / 1e9:9.4f}s ({share})  self {self_ns / 1e9:9.4f}s  "
+                     f"n={len(calls):<7} p50 {ms(percentile(calls, 0.5))}  "
+                     f"p95 {ms(percentile(calls, 0.95))}  max {ms(calls[-1])}")
+    return lines
+
+
+def tree_order(path):
+    # Children under their parent, siblings by decreasing total time
+    return tuple(item for depth in range(1, len(path) + 1)
+                 for item in (-sum(spans.get(path[:depth], [[0]])[0]), path[depth - 1]))
+
+
+def ms(ns):
+    return f"{ns / 1e6:9.3f}ms"
+
+
+def export_chrome_trace(path):
+    """Write the trace events as Chrome trace / Perfetto JSON."""
+    with open(path, 'w') as f:
+        json.dump({"traceEvents": trace_events or [], "displayTimeUnit": "ms"}, f)